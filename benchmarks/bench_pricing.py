@@ -0,0 +1,86 @@
+"""Throughput of InvoiceService.compute_total against the compiled kernel.
+
+Run with ``PYTHONPATH=src python benchmarks/bench_pricing.py``; pass
+``--corpus DIR/corpus.jsonl`` to replay invoices captured by
+``latency_profiler.ProfiledPricer.dump`` instead of random ones.
+"""
+import argparse
+import random
+import time
+from typing import Callable, List
+
+from invoice_service import Invoice, InvoiceService, LineItem
+from latency_profiler import load_corpus
+from pricing_compiler import compile_pricing
+
+COUNTRIES = ["TH", "JP", "US", "XX"]
+MEMBERSHIPS = ["none", "gold", "platinum"]
+COUPONS = [None, "", "WELCOME10", "VIP20", "STUDENT5", "BOGUS"]
+CATEGORIES = ["book", "food", "electronics", "other"]
+
+
+def make_invoices(count: int, seed: int = 1) -> List[Invoice]:
+    rng = random.Random(seed)
+    invoices = []
+    for i in range(count):
+        items = [
+            LineItem(
+                sku=f"S{j}",
+                category=rng.choice(CATEGORIES),
+                unit_price=round(rng.uniform(1, 2000), 2),
+                qty=rng.randint(1, 5),
+                fragile=rng.random() < 0.2,
+            )
+            for j in range(rng.randint(1, 6))
+        ]
+        invoices.append(Invoice(
+            invoice_id=f"I-{i}",
+            customer_id=f"C-{i % 1000}",
+            country=rng.choice(COUNTRIES),
+            membership=rng.choice(MEMBERSHIPS),
+            coupon=rng.choice(COUPONS),
+            items=items,
+        ))
+    return invoices
+
+
+def throughput(price: Callable, invoices: List[Invoice], repeat: int = 5) -> float:
+    """Best invoices/second over ``repeat`` passes."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for inv in invoices:
+            price(inv)
+        best = min(best, time.perf_counter() - start)
+    return len(invoices) / best
+
+
+def _price_or_reject(price: Callable) -> Callable:
+    """Replayed corpora may contain invalid invoices; time the rejection too."""
+    def run(inv: Invoice) -> None:
+        try:
+            price(inv)
+        except ValueError:
+            pass
+    return run
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", help="replay a captured corpus.jsonl")
+    parser.add_argument("--count", type=int, default=20000)
+    args = parser.parse_args()
+    if args.corpus:
+        invoices = load_corpus(args.corpus)
+        print(f"replaying {len(invoices)} captured invoices")
+    else:
+        invoices = make_invoices(args.count)
+    service = InvoiceService()
+    reference = throughput(_price_or_reject(service.compute_total), invoices)
+    compiled = throughput(_price_or_reject(compile_pricing(service)), invoices)
+    print(f"compute_total   {reference:12,.0f} invoices/s")
+    print(f"compiled kernel {compiled:12,.0f} invoices/s  ({compiled / reference:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Scaling of one shared InvoiceService across threads.
+
+Run with ``PYTHONPATH=src python benchmarks/bench_threads.py``. On a
+free-threaded (no-GIL) CPython build throughput should grow with the
+thread count; with the GIL it stays roughly flat. The second run attaches
+CustomerAccounts, so every invoice also looks up rolling spend.
+"""
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from bench_pricing import make_invoices
+from customer_accounts import CustomerAccounts, SECONDS_PER_DAY
+from invoice_service import Invoice, InvoiceService
+
+
+def with_accounts() -> InvoiceService:
+    accounts = CustomerAccounts(clock=lambda: 1000 * SECONDS_PER_DAY)
+    for i in range(1000):
+        accounts.record(f"C-{i}", 10.0 * i, day=1000 - i % 60)
+    return InvoiceService(accounts=accounts)
+
+
+def scale(service: InvoiceService, invoices: List[Invoice]) -> None:
+    baseline = None
+    for threads in (1, 2, 4, 8):
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            service.compute_totals_threaded(invoices[:1000], executor=pool)
+            start = time.perf_counter()
+            service.compute_totals_threaded(invoices, chunk_size=1000, executor=pool)
+            rate = len(invoices) / (time.perf_counter() - start)
+        baseline = baseline or rate
+        print(f"{threads} threads {rate:12,.0f} invoices/s  ({rate / baseline:.2f}x)")
+
+
+def main() -> None:
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"Python {sys.version.split()[0]}, GIL {'enabled' if gil else 'disabled'}")
+    invoices = make_invoices(40000)
+    for name, service in (("no accounts", InvoiceService()), ("with accounts", with_accounts())):
+        print(name)
+        scale(service, invoices)
+
+
+if __name__ == "__main__":
+    main()
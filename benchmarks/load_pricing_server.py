@@ -0,0 +1,83 @@
+"""Load generator for the pricing HTTP server.
+
+Opens ``--connections`` keep-alive connections and reports p50/p99 latency
+and requests/second. Without ``--port`` it starts a server in-process on
+an ephemeral localhost port (sharing this process's CPU).
+
+Run with ``PYTHONPATH=src python benchmarks/load_pricing_server.py``.
+"""
+import argparse
+import asyncio
+import time
+from typing import List, Optional
+
+from bench_pricing import make_invoices
+from invoice_service import Invoice
+from pricing_client import PricingClient
+from pricing_server import PricingServer
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+async def _drive(
+    client: PricingClient, invoices: List[Invoice], batch_size: int, latencies: List[float]
+) -> None:
+    async with client:
+        for start in range(0, len(invoices), batch_size):
+            began = time.perf_counter()
+            if batch_size == 1:
+                status, _ = await client.price(invoices[start])
+            else:
+                status, _ = await client.price_batch(invoices[start:start + batch_size])
+            latencies.append(time.perf_counter() - began)
+            if status != 200:
+                raise RuntimeError(f"Server answered {status}")
+
+
+async def run(host: str, port: Optional[int], connections: int, requests: int, batch_size: int) -> None:
+    server = None
+    if port is None:
+        server = PricingServer(host=host, port=0)
+        await server.start()
+        port = server.port
+    invoices = make_invoices(requests * batch_size)
+    per_connection = len(invoices) // connections
+    latencies: List[float] = []
+    began = time.perf_counter()
+    await asyncio.gather(*(
+        _drive(
+            PricingClient(host, port),
+            invoices[i * per_connection:(i + 1) * per_connection],
+            batch_size,
+            latencies,
+        )
+        for i in range(connections)
+    ))
+    elapsed = time.perf_counter() - began
+    if server is not None:
+        await server.close()
+
+    latencies.sort()
+    print(f"requests   {len(latencies):>10}  (batch size {batch_size}, {connections} connections)")
+    print(f"req/s      {len(latencies) / elapsed:>10,.0f}")
+    print(f"invoices/s {len(latencies) * batch_size / elapsed:>10,.0f}")
+    print(f"p50        {percentile(latencies, 0.50) * 1e3:>10.3f} ms")
+    print(f"p99        {percentile(latencies, 0.99) * 1e3:>10.3f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--connections", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=1)
+    args = parser.parse_args()
+    asyncio.run(run(args.host, args.port, args.connections, args.requests, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+SECONDS_PER_DAY = 86400
+
+_CENTS = 100
+_BUCKET_MIN, _BUCKET_MAX = -2 ** 31, 2 ** 31 - 1
+_PAGE_SLOTS = 256
+_STRIPES = 64
+
+
+class _Page:
+    """Arrays for up to ``_PAGE_SLOTS`` accounts, allocated once and never resized."""
+    __slots__ = ("last_day", "buckets", "sums")
+
+    def __init__(self, horizon: int, windows: int) -> None:
+        self.last_day = array("i", bytes(array("i").itemsize * _PAGE_SLOTS))
+        self.buckets = array("i", bytes(array("i").itemsize * _PAGE_SLOTS * horizon))
+        self.sums = array("q", bytes(array("q").itemsize * _PAGE_SLOTS * windows))
+
+
+class CustomerAccounts:
+    """Rolling-window spend per customer_id.
+
+    Accounts live in pages of flat arrays rather than one object each:
+    spend is kept in whole cents, one int32 bucket per day for the longest
+    window, plus an int64 running sum per window. With the default (30, 90)
+    windows that is 4 * 90 + 4 + 8 * 2 = 380 bytes per customer, plus its
+    entry in the id index. A single day's bucket saturates at about 21.4
+    million. Recording and lookups are O(1) per invoice and never scan
+    invoice history.
+
+    Safe to share between threads. Lookups only read: they subtract what
+    has expired since the account's last record instead of advancing it.
+    Each account is guarded by one of ``_STRIPES`` striped locks, so pricing
+    threads only wait on each other for customers on the same stripe.
+
+    Days only move forward per account: invoices for earlier days can
+    still be recorded, but a lookup for an explicit day before the latest
+    day recorded for the account raises ``ValueError``, since expired
+    buckets are gone. Lookups for today never do.
+    """
+
+    def __init__(
+        self,
+        windows: Iterable[int] = (30, 90),
+        default_window: Optional[int] = None,
+        clock: Optional[Callable[[], float]] = None,
+    ) -> None:
+        self.windows: Tuple[int, ...] = tuple(sorted(set(windows)))
+        if not self.windows or self.windows[0] <= 0:
+            raise ValueError("windows must be positive day counts")
+        self.horizon = self.windows[-1]
+        self.default_window = self.horizon if default_window is None else default_window
+        if self.default_window not in self.windows:
+            raise ValueError(f"Unknown window {self.default_window}")
+        self._clock = clock if clock is not None else time.time
+        self._slots: Dict[str, int] = {}
+        self._pages: List[_Page] = []
+        # Guards creating accounts; each account's data is guarded by its stripe
+        self._lock = threading.Lock()
+        self._stripes = tuple(threading.Lock() for _ in range(_STRIPES))
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, customer_id: object) -> bool:
+        return customer_id in self._slots
+
+    def today(self) -> int:
+        return int(self._clock() // SECONDS_PER_DAY)
+
+    def _add(self, customer_id: str, day: int, buckets: Optional[bytes] = None) -> int:
+        """Create an account; call with ``_lock`` held."""
+        slot = len(self._slots)
+        if slot % _PAGE_SLOTS == 0:
+            self._pages.append(_Page(self.horizon, len(self.windows)))
+        page, i = self._locate(slot)
+        page.last_day[i] = day
+        if buckets is not None:
+            start = i * self.horizon
+            page.buckets[start:start + self.horizon] = array("i", buckets)
+            self._resum(page, i)
+        # Publish only once the account's data is in place
+        self._slots[customer_id] = slot
+        return slot
+
+    def _locate(self, slot: int) -> Tuple[_Page, int]:
+        return self._pages[slot // _PAGE_SLOTS], slot % _PAGE_SLOTS
+
+    def _advance(self, page: _Page, i: int, day: int) -> None:
+        """Move account ``i`` of ``page`` forward to ``day``, expiring buckets that fell out."""
+        last_day = page.last_day[i]
+        elapsed = day - last_day
+        if elapsed <= 0:
+            return
+        horizon = self.horizon
+        base = i * horizon
+        buckets = page.buckets
+        if elapsed >= horizon:
+            for k in range(base, base + horizon):
+                buckets[k] = 0
+        else:
+            for d in range(last_day + 1, day + 1):
+                buckets[base + d % horizon] = 0
+        page.last_day[i] = day
+        self._resum(page, i)
+
+    def _ring_sum(self, page: _Page, i: int, first: int, last: int) -> int:
+        """Sum account ``i``'s buckets for days ``first..last`` (at most ``horizon`` days)."""
+        if first > last:
+            return 0
+        horizon = self.horizon
+        base = i * horizon
+        start, end = base + first % horizon, base + last % horizon
+        if start <= end:
+            return sum(page.buckets[start:end + 1])
+        # The span wraps around the end of the ring
+        return sum(page.buckets[start:base + horizon]) + sum(page.buckets[base:end + 1])
+
+    def _resum(self, page: _Page, i: int) -> None:
+        last_day = page.last_day[i]
+        for w, window in enumerate(self.windows):
+            page.sums[i * len(self.windows) + w] = self._ring_sum(page, i, last_day - window + 1, last_day)
+
+    def record(self, customer_id: str, amount: float, day: Optional[int] = None) -> None:
+        """Add ``amount`` to the customer's spend on ``day`` (default today)."""
+        if day is None:
+            day = self.today()
+        cents = round(amount * _CENTS)
+        slot = self._slots.get(customer_id)
+        if slot is None:
+            with self._lock:
+                slot = self._slots.get(customer_id)
+                if slot is None:
+                    slot = self._add(customer_id, day)
+        page, i = self._locate(slot)
+        with self._stripes[slot % _STRIPES]:
+            self._advance(page, i, day)
+            age = page.last_day[i] - day
+            if age >= self.horizon:
+                return
+            index = i * self.horizon + day % self.horizon
+            old = page.buckets[index]
+            new = min(max(old + cents, _BUCKET_MIN), _BUCKET_MAX)
+            page.buckets[index] = new
+            first_sum = i * len(self.windows)
+            for w, window in enumerate(self.windows):
+                if age < window:
+                    page.sums[first_sum + w] += new - old
+
+    def rolling_spend(self, customer_id: str, window: Optional[int] = None, day: Optional[int] = None) -> float:
+        """Return the customer's spend over the last ``window`` days.
+
+        Without ``day`` the lookup is for today, or for the latest day
+        recorded for the customer if that is later (a record dated
+        ahead of the clock, or a clock that stepped back). An explicit
+        ``day`` earlier than that raises ``ValueError``.
+        """
+        index = self.windows.index(self.default_window if window is None else window)
+        slot = self._slots.get(customer_id)
+        if slot is None:
+            return 0.0
+        page, i = self._pages[slot // _PAGE_SLOTS], slot % _PAGE_SLOTS
+        window_days = self.windows[index]
+        with self._stripes[slot % _STRIPES]:
+            last_day = page.last_day[i]
+            if day is None:
+                # Read under the lock so a concurrent record cannot move last_day past it
+                day = max(self.today(), last_day)
+            elif day < last_day:
+                raise ValueError(f"Day {day} is before the last day recorded for {customer_id} ({last_day})")
+            total = page.sums[i * len(self.windows) + index]
+            elapsed = day - last_day
+            if elapsed >= window_days:
+                return 0.0
+            if elapsed:
+                # Sum whichever is shorter: the days that expired since last_day, or those still live
+                if 2 * elapsed <= window_days:
+                    total -= self._ring_sum(page, i, last_day - window_days + 1, day - window_days)
+                else:
+                    total = self._ring_sum(page, i, day - window_days + 1, last_day)
+        return total / _CENTS
+
+    def save(self, path: str) -> None:
+        """Persist all accounts to a SQLite file at ``path``."""
+        with sqlite3.connect(path) as conn:
+            conn.execute("DROP TABLE IF EXISTS meta")
+            conn.execute("DROP TABLE IF EXISTS accounts")
+            conn.execute("CREATE TABLE meta (windows TEXT, default_window INTEGER)")
+            conn.execute(
+                "CREATE TABLE accounts (customer_id TEXT PRIMARY KEY, last_day INTEGER, buckets BLOB)"
+            )
+            conn.execute(
+                "INSERT INTO meta VALUES (?, ?)",
+                (",".join(map(str, self.windows)), self.default_window),
+            )
+            horizon = self.horizon
+            rows = []
+            with self._lock:
+                for cid, slot in self._slots.items():
+                    page, i = self._locate(slot)
+                    with self._stripes[slot % _STRIPES]:
+                        buckets = page.buckets[i * horizon:(i + 1) * horizon].tobytes()
+                        rows.append((cid, page.last_day[i], buckets))
+            conn.executemany("INSERT INTO accounts VALUES (?, ?, ?)", rows)
+        conn.close()
+
+    @classmethod
+    def load(cls, path: str, clock: Optional[Callable[[], float]] = None) -> "CustomerAccounts":
+        """Load accounts previously written by ``save``."""
+        conn = sqlite3.connect(path)
+        try:
+            windows, default_window = conn.execute("SELECT windows, default_window FROM meta").fetchone()
+            accounts = cls(
+                windows=[int(w) for w in windows.split(",")],
+                default_window=default_window,
+                clock=clock,
+            )
+            expected = array("i").itemsize * accounts.horizon
+            for customer_id, last_day, blob in conn.execute("SELECT * FROM accounts"):
+                if len(blob) != expected:
+                    raise ValueError(
+                        f"Bad bucket data for {customer_id}: {len(blob)} bytes, expected {expected}"
+                    )
+                accounts._add(customer_id, last_day, blob)
+        finally:
+            conn.close()
+        return accounts
@@ -0,0 +1,81 @@
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional, Sequence
+
+
+class FxRateTable:
+    """Exchange rates relative to the currency the pricing rules are written in.
+
+    ``rates[code]`` is how many units of ``code`` equal one unit of ``base``.
+    ``version`` changes whenever the rates do, so callers can key caches of
+    converted values on it.
+    """
+
+    def __init__(self, base: str, rates: Dict[str, float], version: Optional[str] = None) -> None:
+        self.base = base
+        self.rates: Dict[str, float] = {base: 1.0}
+        self.path: Optional[str] = None
+        self._mtime: Optional[float] = None
+        self._set_rates(rates, version)
+
+    def _set_rates(self, rates: Dict[str, float], version: Optional[str]) -> None:
+        for code, rate in rates.items():
+            if not rate > 0:
+                raise ValueError(f"Invalid FX rate for {code}")
+        self.rates = {**rates, self.base: 1.0}
+        if version is None:
+            digest = hashlib.sha256(json.dumps(sorted(self.rates.items())).encode())
+            version = digest.hexdigest()[:12]
+        self.version = version
+
+    @classmethod
+    def load(cls, path: str) -> "FxRateTable":
+        """Load a table from a JSON file ``{"base": ..., "rates": {...}, "version": ...}``."""
+        with open(path) as f:
+            data = json.load(f)
+        table = cls(data["base"], data["rates"], data.get("version"))
+        table.path = path
+        table._mtime = os.path.getmtime(path)
+        return table
+
+    def reload(self) -> bool:
+        """Re-read the backing file if it changed; return True if it did."""
+        if self.path is None or os.path.getmtime(self.path) == self._mtime:
+            return False
+        with open(self.path) as f:
+            data = json.load(f)
+        if data["base"] != self.base:
+            raise ValueError(f"FX base changed from {self.base} to {data['base']}")
+        self._mtime = os.path.getmtime(self.path)
+        old_version = self.version
+        self._set_rates(data["rates"], data.get("version"))
+        return self.version != old_version
+
+    def __contains__(self, currency: object) -> bool:
+        return currency in self.rates
+
+    def rate(self, currency: Optional[str]) -> float:
+        """Units of ``currency`` per unit of the base currency."""
+        if currency is None:
+            return 1.0
+        try:
+            return self.rates[currency]
+        except KeyError:
+            raise ValueError(f"Unknown currency {currency}") from None
+
+    def convert(self, amount: float, source: Optional[str], target: Optional[str]) -> float:
+        return amount * (self.rate(target) / self.rate(source))
+
+    def convert_batch(
+        self,
+        amounts: Sequence[float],
+        currencies: Sequence[Optional[str]],
+        target: Optional[str] = None,
+    ) -> List[float]:
+        """Convert many amounts to ``target`` with one factor lookup per currency."""
+        if len(amounts) != len(currencies):
+            raise ValueError("amounts and currencies must have the same length")
+        target_rate = self.rate(target)
+        factors = {c: target_rate / self.rate(c) for c in set(currencies)}
+        return [amount * factors[c] for amount, c in zip(amounts, currencies)]
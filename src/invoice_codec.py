@@ -0,0 +1,64 @@
+"""Compact JSON form of invoices, shared by the pricing server, client and profiler.
+
+Invoices are JSON objects using the Invoice field names, with items sent
+as ``[sku, category, unit_price, qty, fragile]`` arrays (``fragile`` may
+be omitted). Decoding checks field types and raises ``ValueError`` on
+anything malformed.
+"""
+from typing import Any, Dict
+
+from invoice_service import Invoice, LineItem
+
+_REQUIRED = ("invoice_id", "customer_id", "country", "items")
+
+
+def _expect(value: Any, types: Any, field: str, optional: bool = False) -> Any:
+    if (value is None and optional) or (isinstance(value, types) and not isinstance(value, bool)):
+        return value
+    raise ValueError(f"Malformed invoice: bad {field}")
+
+
+def _decode_item(item: Any) -> LineItem:
+    if not isinstance(item, list) or len(item) not in (4, 5):
+        raise ValueError("Malformed invoice: bad item")
+    if len(item) == 5 and not isinstance(item[4], bool):
+        raise ValueError("Malformed invoice: bad fragile")
+    sku, category, unit_price, qty = item[:4]
+    return LineItem(
+        _expect(sku, str, "sku"),
+        _expect(category, str, "category"),
+        _expect(unit_price, (int, float), "unit_price"),
+        _expect(qty, int, "qty"),
+        *item[4:],
+    )
+
+
+def decode_invoice(obj: Dict[str, Any]) -> Invoice:
+    """Build an Invoice from its compact JSON form, checking field types."""
+    missing = [name for name in _REQUIRED if name not in obj]
+    if missing:
+        raise ValueError(f"Malformed invoice: missing {', '.join(missing)}")
+    return Invoice(
+        invoice_id=_expect(obj["invoice_id"], str, "invoice_id"),
+        customer_id=_expect(obj["customer_id"], str, "customer_id"),
+        country=_expect(obj["country"], str, "country"),
+        membership=_expect(obj.get("membership", "none"), str, "membership"),
+        coupon=_expect(obj.get("coupon"), str, "coupon", optional=True),
+        items=[_decode_item(item) for item in _expect(obj["items"], list, "items")],
+        currency=_expect(obj.get("currency"), str, "currency", optional=True),
+    )
+
+
+def encode_invoice(inv: Invoice) -> Dict[str, Any]:
+    """Inverse of ``decode_invoice``."""
+    obj: Dict[str, Any] = {
+        "invoice_id": inv.invoice_id,
+        "customer_id": inv.customer_id,
+        "country": inv.country,
+        "membership": inv.membership,
+        "coupon": inv.coupon,
+        "items": [[it.sku, it.category, it.unit_price, it.qty, it.fragile] for it in inv.items],
+    }
+    if inv.currency is not None:
+        obj["currency"] = inv.currency
+    return obj
@@ -1,5 +1,11 @@
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import List, Optional, Dict, Tuple
+from types import MappingProxyType
+from typing import Any, List, Mapping, NamedTuple, Optional, Dict, Tuple
+
+from customer_accounts import CustomerAccounts
+from fx_rates import FxRateTable
 
 @dataclass
 class LineItem:
@@ -17,8 +23,114 @@ class Invoice:
     membership: str
     coupon: Optional[str]
     items: List[LineItem]
+    # None means the currency the pricing rules are written in
+    currency: Optional[str] = None
+
+def _convert_tiers(tiers, rate: float) -> Tuple[Tuple[float, float], ...]:
+    return tuple((threshold * rate, cost * rate) for threshold, cost in tiers)
+
+class RuleSnapshot(NamedTuple):
+    """Hashable copy of the pricing rule tables at a point in time."""
+    tax_rates: Tuple[Tuple[str, float], ...]
+    default_tax_rate: float
+    coupon_rates: Tuple[Tuple[str, float], ...]
+    membership_discounts: Tuple[Tuple[str, float], ...]
+    shipping_rates: Tuple[Tuple[str, Tuple[Tuple[float, float], ...]], ...]
+    default_shipping_rates: Tuple[Tuple[float, float], ...]
+    bulk_discount_threshold: float
+    bulk_discount: float
+    upgrade_threshold: float
+    upgrade_exempt_memberships: Tuple[str, ...]
+    fragile_fee_per_unit: float
+    valid_categories: Tuple[str, ...]
+    # Units of the pricing currency per unit of the rules' own currency
+    currency_rate: float = 1.0
+
+class PricingRules(NamedTuple):
+    """Immutable rule state an InvoiceService prices with.
+
+    Field names mirror the InvoiceService class attributes they are copied
+    from. Instances are never modified; rule changes build a new one.
+    """
+    TAX_RATES: Mapping[str, float]
+    DEFAULT_TAX_RATE: float
+    COUPON_RATES: Mapping[str, float]
+    MEMBERSHIP_DISCOUNTS: Mapping[str, float]
+    SHIPPING_RATES: Mapping[str, Tuple[Tuple[float, float], ...]]
+    DEFAULT_SHIPPING_RATES: Tuple[Tuple[float, float], ...]
+    BULK_DISCOUNT_THRESHOLD: float
+    BULK_DISCOUNT: float
+    UPGRADE_THRESHOLD: float
+    UPGRADE_EXEMPT_MEMBERSHIPS: Tuple[str, ...]
+    FRAGILE_FEE_PER_UNIT: float
+    VALID_CATEGORIES: Tuple[str, ...]
+    # Units of the pricing currency per unit of the rules' own currency
+    RATE: float = 1.0
+
+    @classmethod
+    def freeze(cls, source: Any, **changes: Any) -> "PricingRules":
+        """Copy the rule attributes of ``source`` (overridden by ``changes``) into read-only form."""
+        def get(name: str) -> Any:
+            return changes[name] if name in changes else getattr(source, name)
+
+        unknown = set(changes) - set(cls._fields)
+        if unknown:
+            raise ValueError(f"Unknown rules: {', '.join(sorted(unknown))}")
+        return cls(
+            TAX_RATES=MappingProxyType(dict(get("TAX_RATES"))),
+            DEFAULT_TAX_RATE=get("DEFAULT_TAX_RATE"),
+            COUPON_RATES=MappingProxyType(dict(get("COUPON_RATES"))),
+            MEMBERSHIP_DISCOUNTS=MappingProxyType(dict(get("MEMBERSHIP_DISCOUNTS"))),
+            SHIPPING_RATES=MappingProxyType({
+                country: tuple(tuple(tier) for tier in tiers) for country, tiers in get("SHIPPING_RATES").items()
+            }),
+            DEFAULT_SHIPPING_RATES=tuple(tuple(tier) for tier in get("DEFAULT_SHIPPING_RATES")),
+            BULK_DISCOUNT_THRESHOLD=get("BULK_DISCOUNT_THRESHOLD"),
+            BULK_DISCOUNT=get("BULK_DISCOUNT"),
+            UPGRADE_THRESHOLD=get("UPGRADE_THRESHOLD"),
+            UPGRADE_EXEMPT_MEMBERSHIPS=tuple(get("UPGRADE_EXEMPT_MEMBERSHIPS")),
+            FRAGILE_FEE_PER_UNIT=get("FRAGILE_FEE_PER_UNIT"),
+            VALID_CATEGORIES=tuple(get("VALID_CATEGORIES")),
+            RATE=changes.get("RATE", getattr(source, "RATE", 1.0)),
+        )
+
+    def converted(self, rate: float) -> "PricingRules":
+        """Return these rules with every money amount multiplied by ``rate``."""
+        return self._replace(
+            SHIPPING_RATES=MappingProxyType({
+                country: _convert_tiers(tiers, rate) for country, tiers in self.SHIPPING_RATES.items()
+            }),
+            DEFAULT_SHIPPING_RATES=_convert_tiers(self.DEFAULT_SHIPPING_RATES, rate),
+            BULK_DISCOUNT_THRESHOLD=self.BULK_DISCOUNT_THRESHOLD * rate,
+            BULK_DISCOUNT=self.BULK_DISCOUNT * rate,
+            UPGRADE_THRESHOLD=self.UPGRADE_THRESHOLD * rate,
+            FRAGILE_FEE_PER_UNIT=self.FRAGILE_FEE_PER_UNIT * rate,
+            RATE=self.RATE * rate,
+        )
+
+    def snapshot(self) -> RuleSnapshot:
+        """Hashable form of these rules, e.g. for caching compiled kernels."""
+        return RuleSnapshot(
+            tax_rates=tuple(sorted(self.TAX_RATES.items())),
+            default_tax_rate=self.DEFAULT_TAX_RATE,
+            coupon_rates=tuple(sorted(self.COUPON_RATES.items())),
+            membership_discounts=tuple(sorted(self.MEMBERSHIP_DISCOUNTS.items())),
+            shipping_rates=tuple(sorted(self.SHIPPING_RATES.items())),
+            default_shipping_rates=self.DEFAULT_SHIPPING_RATES,
+            bulk_discount_threshold=self.BULK_DISCOUNT_THRESHOLD,
+            bulk_discount=self.BULK_DISCOUNT,
+            upgrade_threshold=self.UPGRADE_THRESHOLD,
+            upgrade_exempt_memberships=self.UPGRADE_EXEMPT_MEMBERSHIPS,
+            fragile_fee_per_unit=self.FRAGILE_FEE_PER_UNIT,
+            valid_categories=self.VALID_CATEGORIES,
+            currency_rate=self.RATE,
+        )
 
 class InvoiceService:
+    # The class-level tables below are defaults. Each instance freezes a
+    # copy at construction and prices only from that copy; use
+    # update_rules() to change an instance's rules.
+
     # Tax rates by country
     TAX_RATES: Dict[str, float] = {
         "TH": 0.07,
@@ -51,10 +163,67 @@ class InvoiceService:
     
     DEFAULT_SHIPPING_RATES: List[Tuple[float, float]] = [(200, 0), (float('inf'), 25)]
 
-    def __init__(self) -> None:
-        self._coupon_rate: Dict[str, float] = self.COUPON_RATES
+    # Flat discount for non-members above the bulk threshold
+    BULK_DISCOUNT_THRESHOLD: float = 3000
+    BULK_DISCOUNT: float = 20
+
+    # Subtotal above which non-members are nudged to upgrade
+    UPGRADE_THRESHOLD: float = 10000
+    UPGRADE_EXEMPT_MEMBERSHIPS: Tuple[str, ...] = ("gold", "platinum")
+
+    # Handling fee per fragile unit
+    FRAGILE_FEE_PER_UNIT: float = 5.0
+
+    VALID_CATEGORIES: Tuple[str, ...] = ("book", "food", "electronics", "other")
+
+    def __init__(self, accounts: Optional[CustomerAccounts] = None, fx: Optional[FxRateTable] = None) -> None:
+        # Immutable and replaced wholesale, so pricing reads it without locks
+        self._rules = PricingRules.freeze(self)
+        self._rules_lock = threading.Lock()
+        # Rolling customer spend consulted for upgrade suggestions
+        self.accounts = accounts
+        # Exchange rates for invoices not priced in the rules' own currency
+        self.fx = fx
+        # (base rules, FX version, converted rules per currency), swapped as a unit
+        self._currency_state: Tuple[PricingRules, Optional[str], Dict[str, PricingRules]] = (self._rules, None, {})
 
-    def _validate(self, inv: Invoice) -> List[str]:
+    @property
+    def rules(self) -> PricingRules:
+        return self._rules
+
+    def update_rules(self, **changes: Any) -> PricingRules:
+        """Atomically replace some rule tables, e.g. ``update_rules(TAX_RATES={...})``.
+
+        Calls already in progress finish with the rules they started with.
+        """
+        with self._rules_lock:
+            self._rules = PricingRules.freeze(self._rules, **changes)
+            return self._rules
+
+    def rules_snapshot(self) -> RuleSnapshot:
+        """Return the rules this instance currently prices with."""
+        return self._rules.snapshot()
+
+    def _currency_rules(self, currency: Optional[str], rules: PricingRules) -> PricingRules:
+        """``rules`` with money amounts converted into ``currency``.
+
+        Conversions are cached per currency until the rules or the FX table
+        version change.
+        """
+        if currency is None or currency == self.fx.base:  # +1
+            return rules
+        version = self.fx.version
+        state = self._currency_state
+        if state[0] is not rules or state[1] != version:  # +1
+            state = (rules, version, {})
+            self._currency_state = state
+        converted = state[2].get(currency)
+        if converted is None:  # +1
+            converted = rules.converted(self.fx.rate(currency))
+            state[2][currency] = converted
+        return converted
+
+    def _validate(self, inv: Invoice, rules: PricingRules) -> List[str]:
         problems: List[str] = []
         if inv is None:
             problems.append("Invoice is missing")
@@ -72,53 +241,109 @@ class InvoiceService:
                 problems.append(f"Invalid qty for {it.sku}")
             if it.unit_price < 0:
                 problems.append(f"Invalid price for {it.sku}")
-            if it.category not in ("book", "food", "electronics", "other"):
+            if it.category not in rules.VALID_CATEGORIES:
                 problems.append(f"Unknown category for {it.sku}")
+        if inv.currency is not None and (self.fx is None or inv.currency not in self.fx):
+            problems.append(f"Unknown currency {inv.currency}")
         return problems
 
-    def _calculate_shipping(self, country: str, subtotal: float) -> float:
+    def _calculate_shipping(self, country: str, subtotal: float, rules: PricingRules) -> float:
         """Calculate shipping based on country and subtotal."""
-        rates = self.SHIPPING_RATES.get(country)
+        rates = rules.SHIPPING_RATES.get(country)
         if rates is None:
-            rates = self.DEFAULT_SHIPPING_RATES
+            rates = rules.DEFAULT_SHIPPING_RATES
         
         for threshold, cost in rates:  # +1
             if subtotal < threshold:  # +1 (nested)
                 return cost
         return 0.0
 
-    def _calculate_discount(self, membership: str, subtotal: float) -> float:
+    def _calculate_discount(self, membership: str, subtotal: float, rules: PricingRules) -> float:
         """Calculate membership discount."""
-        if membership in self.MEMBERSHIP_DISCOUNTS:  # +1
-            return subtotal * self.MEMBERSHIP_DISCOUNTS[membership]
+        if membership in rules.MEMBERSHIP_DISCOUNTS:  # +1
+            return subtotal * rules.MEMBERSHIP_DISCOUNTS[membership]
         
         # Apply bulk discount for non-members
-        if subtotal > 3000:  # +1
-            return 20
+        if subtotal > rules.BULK_DISCOUNT_THRESHOLD:  # +1
+            return rules.BULK_DISCOUNT
         return 0.0
 
-    def _apply_coupon(self, code: str, subtotal: float) -> Tuple[float, Optional[str]]:
+    def _apply_coupon(self, code: str, subtotal: float, rules: PricingRules) -> Tuple[float, Optional[str]]:
         """Apply coupon code and return discount and warning if applicable."""
         if not code or not code.strip():  # +1
             return 0.0, None
         
         code = code.strip()
-        if code in self._coupon_rate:  # +1
-            discount = subtotal * self._coupon_rate[code]
+        if code in rules.COUPON_RATES:  # +1
+            discount = subtotal * rules.COUPON_RATES[code]
             return discount, None
         
         return 0.0, "Unknown coupon"
 
-    def _calculate_tax(self, country: str, taxable_amount: float) -> float:
+    def _calculate_tax(self, country: str, taxable_amount: float, rules: PricingRules) -> float:
         """Calculate tax based on country."""
-        rate = self.TAX_RATES.get(country, self.DEFAULT_TAX_RATE)
+        rate = rules.TAX_RATES.get(country, rules.DEFAULT_TAX_RATE)
         return taxable_amount * rate
 
+    def _upgrade_spend(self, inv: Invoice, subtotal: float, rules: PricingRules) -> float:
+        """Spend the upgrade suggestion is based on: this invoice plus recent history.
+
+        Account history is kept in the rules' own currency.
+        """
+        if self.accounts is None:  # +1
+            return subtotal
+        return subtotal + self.accounts.rolling_spend(inv.customer_id) * rules.RATE
+
+    def compute_totals(
+        self, invoices: List[Invoice], report_currency: Optional[str] = None
+    ) -> List[Tuple[float, List[str]]]:
+        """Price a batch of invoices.
+
+        Totals are in each invoice's own currency unless ``report_currency``
+        is given, in which case they are converted in one batch.
+        """
+        results = [self.compute_total(inv) for inv in invoices]
+        if report_currency is None:  # +1
+            return results
+        if self.fx is None:  # +1
+            raise ValueError(f"Unknown currency {report_currency}")
+        converted = self.fx.convert_batch(
+            [total for total, _ in results], [inv.currency for inv in invoices], report_currency
+        )
+        return [(total, warnings) for total, (_, warnings) in zip(converted, results)]
+
+    def compute_totals_threaded(
+        self,
+        invoices: List[Invoice],
+        report_currency: Optional[str] = None,
+        chunk_size: int = 256,
+        max_workers: Optional[int] = None,
+        executor: Optional[Executor] = None,
+    ) -> List[Tuple[float, List[str]]]:
+        """Like ``compute_totals`` but prices chunks of ``invoices`` on a thread pool.
+
+        Pass a long-lived ``executor`` to avoid starting threads per call.
+        """
+        chunks = [invoices[i:i + chunk_size] for i in range(0, len(invoices), chunk_size)]
+
+        def price(chunk: List[Invoice]) -> List[Tuple[float, List[str]]]:
+            return self.compute_totals(chunk, report_currency)
+
+        if executor is None:  # +1
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                parts = list(pool.map(price, chunks))
+        else:
+            parts = list(executor.map(price, chunks))
+        return [result for part in parts for result in part]
+
     def compute_total(self, inv: Invoice) -> Tuple[float, List[str]]:  # +1 (method def counts minimal)
         warnings: List[str] = []
-        problems = self._validate(inv)
+        # Read the rule state once so the whole call sees one consistent version
+        rules = self._rules
+        problems = self._validate(inv, rules)
         if problems:  # +1
             raise ValueError("; ".join(problems))
+        rules = self._currency_rules(inv.currency, rules)
 
         # Calculate base costs
         subtotal = 0.0
@@ -127,14 +352,14 @@ class InvoiceService:
             line = it.unit_price * it.qty
             subtotal += line
             if it.fragile:  # +1 (nested)
-                fragile_fee += 5.0 * it.qty
+                fragile_fee += rules.FRAGILE_FEE_PER_UNIT * it.qty
 
         # Calculate shipping
-        shipping = self._calculate_shipping(inv.country, subtotal)
+        shipping = self._calculate_shipping(inv.country, subtotal, rules)
         
         # Calculate discounts
-        membership_discount = self._calculate_discount(inv.membership, subtotal)
-        coupon_discount, coupon_warning = self._apply_coupon(inv.coupon, subtotal)
+        membership_discount = self._calculate_discount(inv.membership, subtotal, rules)
+        coupon_discount, coupon_warning = self._apply_coupon(inv.coupon, subtotal, rules)
         
         if coupon_warning:  # +1
             warnings.append(coupon_warning)
@@ -142,7 +367,7 @@ class InvoiceService:
         total_discount = membership_discount + coupon_discount
         
         # Calculate tax on discounted amount
-        tax = self._calculate_tax(inv.country, subtotal - total_discount)
+        tax = self._calculate_tax(inv.country, subtotal - total_discount, rules)
         
         # Calculate final total
         total = subtotal + shipping + fragile_fee + tax - total_discount
@@ -150,7 +375,8 @@ class InvoiceService:
             total = 0.0
         
         # Check for membership upgrade opportunity
-        if subtotal > 10000 and inv.membership not in ("gold", "platinum"):  # +1 && +1 (AND operator)
-            warnings.append("Consider membership upgrade")
+        if inv.membership not in rules.UPGRADE_EXEMPT_MEMBERSHIPS:  # +1
+            if self._upgrade_spend(inv, subtotal, rules) > rules.UPGRADE_THRESHOLD:  # +1 (nested)
+                warnings.append("Consider membership upgrade")
         
         return total, warnings
@@ -0,0 +1,180 @@
+import cProfile
+import json
+import math
+import os
+import pstats
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from invoice_codec import decode_invoice, encode_invoice
+from invoice_service import Invoice, InvoiceService
+
+Pricer = Callable[[Invoice], Tuple[float, List[str]]]
+
+
+class LatencyHistogram:
+    """Log-linear (HDR-style) histogram of integer nanosecond latencies.
+
+    Values below ``2 ** sub_bucket_bits`` are counted exactly; larger values
+    share buckets whose width keeps the relative error under
+    ``2 ** (1 - sub_bucket_bits)``. Safe to record into from several threads.
+    """
+
+    def __init__(self, sub_bucket_bits: int = 7) -> None:
+        self.sub_bucket_bits = sub_bucket_bits
+        self._half = 1 << (sub_bucket_bits - 1)
+        self.counts: List[int] = []
+        self.count = 0
+        self.min: Optional[int] = None
+        self.max: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _index(self, value: int) -> int:
+        magnitude = value.bit_length() - self.sub_bucket_bits
+        if magnitude <= 0:
+            return value
+        return magnitude * self._half + (value >> magnitude)
+
+    def _upper_bound(self, index: int) -> int:
+        """Largest value that falls in bucket ``index``."""
+        if index < 2 * self._half:
+            return index
+        magnitude = index // self._half - 1
+        mantissa = index - magnitude * self._half
+        return ((mantissa + 1) << magnitude) - 1
+
+    def record(self, value: int) -> None:
+        value = max(0, int(value))
+        index = self._index(value)
+        with self._lock:
+            if index >= len(self.counts):
+                self.counts.extend([0] * (index + 1 - len(self.counts)))
+            self.counts[index] += 1
+            self.count += 1
+            if self.min is None or value < self.min:
+                self.min = value
+            if self.max is None or value > self.max:
+                self.max = value
+
+    def percentile(self, percent: float) -> int:
+        """Latency at or below which ``percent`` of recorded values fall."""
+        with self._lock:
+            return self._percentile(percent)
+
+    def _percentile(self, percent: float) -> int:
+        if not self.count:
+            return 0
+        target = max(1, math.ceil(self.count * percent / 100))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self._upper_bound(index), self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "count": self.count,
+                "min_ns": self.min,
+                "max_ns": self.max,
+                **{f"p{p:g}_ns": self._percentile(p) for p in (50, 90, 99, 99.9)},
+            }
+
+
+class ProfiledPricer:
+    """Opt-in latency profiling around a pricing function.
+
+    Sampled calls are timed into a LatencyHistogram; any call slower than
+    ``slow_threshold_ms`` has its invoice captured in a bounded ring buffer,
+    and ``cprofile_fraction`` of calls run under cProfile. ``dump`` writes
+    everything out, including a corpus ``bench_pricing.py`` can replay.
+
+    Safe to share between threads. Only one call at a time runs under
+    cProfile, since profilers cannot overlap (on 3.12+ not even across
+    threads); a call drawn for profiling while another is being profiled
+    is timed normally instead.
+    """
+
+    def __init__(
+        self,
+        pricer: Optional[Pricer] = None,
+        slow_threshold_ms: float = 1.0,
+        capacity: int = 1000,
+        sample_rate: float = 1.0,
+        cprofile_fraction: float = 0.0,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.pricer = pricer if pricer is not None else InvoiceService().compute_total
+        self.slow_threshold_ns = int(slow_threshold_ms * 1e6)
+        self.sample_rate = sample_rate
+        self.cprofile_fraction = cprofile_fraction
+        self.histogram = LatencyHistogram()
+        self.slow: Deque[Dict[str, Any]] = deque(maxlen=capacity)
+        self.stats: Optional[pstats.Stats] = None
+        self._random = random.Random(seed)
+        # Guards the slow-invoice ring and stats; _profiling admits one cProfile run at a time
+        self._lock = threading.Lock()
+        self._profiling = threading.Lock()
+
+    def __call__(self, inv: Invoice) -> Tuple[float, List[str]]:
+        draw = self._random.random()
+        if draw < self.cprofile_fraction and self._profiling.acquire(blocking=False):
+            try:
+                return self._profiled(inv)
+            finally:
+                self._profiling.release()
+        if draw >= self.sample_rate:
+            return self.pricer(inv)
+        start = time.perf_counter_ns()
+        try:
+            return self.pricer(inv)
+        finally:
+            self._observe(inv, time.perf_counter_ns() - start)
+
+    compute_total = __call__
+
+    def _profiled(self, inv: Invoice) -> Tuple[float, List[str]]:
+        # cProfile inflates latency, so profiled calls stay out of the histogram
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(self.pricer, inv)
+        finally:
+            with self._lock:
+                if self.stats is None:
+                    self.stats = pstats.Stats(profile)
+                else:
+                    self.stats.add(profile)
+
+    def _observe(self, inv: Invoice, elapsed_ns: int) -> None:
+        self.histogram.record(elapsed_ns)
+        if elapsed_ns >= self.slow_threshold_ns and inv is not None:
+            try:
+                payload = encode_invoice(inv)
+            except (AttributeError, TypeError):
+                return
+            with self._lock:
+                self.slow.append({"latency_ns": elapsed_ns, "invoice": payload})
+
+    def dump(self, directory: str) -> None:
+        """Write ``corpus.jsonl``, ``histogram.json`` and ``profile.pstats``."""
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            slow = list(self.slow)
+        with open(os.path.join(directory, "corpus.jsonl"), "w") as f:
+            for entry in slow:
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        with open(os.path.join(directory, "histogram.json"), "w") as f:
+            json.dump(self.histogram.summary(), f, indent=2)
+        with self._lock:
+            if self.stats is not None:
+                self.stats.dump_stats(os.path.join(directory, "profile.pstats"))
+
+
+def load_corpus(path: str) -> List[Invoice]:
+    """Read invoices captured by ``ProfiledPricer.dump``."""
+    with open(path) as f:
+        return [decode_invoice(json.loads(line)["invoice"]) for line in f if line.strip()]
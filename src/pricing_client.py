@@ -0,0 +1,74 @@
+import asyncio
+import json
+from typing import Any, List, Optional, Tuple
+
+from invoice_codec import encode_invoice
+from invoice_service import Invoice
+
+
+class PricingClient:
+    """Keep-alive client for PricingServer; one request in flight at a time."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8080) -> None:
+        self.host = host
+        self.port = port
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    async def connect(self) -> None:
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            await self._writer.wait_closed()
+            self._reader = self._writer = None
+
+    async def __aenter__(self) -> "PricingClient":
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    async def request(self, method: str, path: str, payload: Any = None) -> Tuple[int, Any]:
+        """Send one request and return ``(status, decoded JSON body)``."""
+        if self._writer is None:
+            await self.connect()
+        body = b"" if payload is None else json.dumps(payload, separators=(",", ":")).encode()
+        self._writer.write(
+            f"{method} {path} HTTP/1.1\r\n"
+            f"Host: {self.host}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "\r\n".encode("latin-1")
+            + body
+        )
+        await self._writer.drain()
+
+        status_line = await self._reader.readline()
+        if not status_line:
+            raise ConnectionError("Server closed the connection")
+        status = int(status_line.split()[1])
+        length = 0
+        keep_alive = True
+        while True:
+            header = await self._reader.readline()
+            if header in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = header.decode("latin-1").partition(":")
+            name = name.strip().lower()
+            if name == "content-length":
+                length = int(value)
+            elif name == "connection":
+                keep_alive = value.strip().lower() != "close"
+        data = await self._reader.readexactly(length)
+        if not keep_alive:
+            await self.close()
+        return status, json.loads(data) if data else None
+
+    async def price(self, inv: Invoice) -> Tuple[int, Any]:
+        return await self.request("POST", "/price", encode_invoice(inv))
+
+    async def price_batch(self, invoices: List[Invoice]) -> Tuple[int, Any]:
+        return await self.request("POST", "/price/batch", {"invoices": [encode_invoice(inv) for inv in invoices]})
@@ -0,0 +1,248 @@
+import math
+from functools import lru_cache, partial
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fx_rates import FxRateTable
+from invoice_service import Invoice, InvoiceService, PricingRules, RuleSnapshot
+
+PricingKernel = Callable[[Invoice], Tuple[float, List[str]]]
+
+
+def _literal(value: object) -> str:
+    """Render a rule value as Python source."""
+    if isinstance(value, float) and not math.isfinite(value):
+        return "_INF" if value > 0 else ("-_INF" if value < 0 else "_NAN")
+    return repr(value)
+
+
+def _shipping_lines(rates: Tuple[Tuple[float, float], ...], indent: str) -> List[str]:
+    """Unroll the tier loop of InvoiceService._calculate_shipping."""
+    lines: List[str] = []
+    keyword = "if"
+    for threshold, cost in rates:
+        if threshold == math.inf:
+            # Nothing after an infinite tier is reachable
+            if keyword == "if":
+                lines.append(f"{indent}shipping = {_literal(cost)}")
+                return lines
+            lines.append(f"{indent}else:")
+            lines.append(f"{indent}    shipping = {_literal(cost)}")
+            return lines
+        lines.append(f"{indent}{keyword} subtotal < {_literal(threshold)}:")
+        lines.append(f"{indent}    shipping = {_literal(cost)}")
+        keyword = "elif"
+    if keyword == "if":
+        lines.append(f"{indent}shipping = 0.0")
+    else:
+        lines.append(f"{indent}else:")
+        lines.append(f"{indent}    shipping = 0.0")
+    return lines
+
+
+def _country_kernel(name: str, tax_rate: float, rates: Tuple[Tuple[float, float], ...]) -> List[str]:
+    lines = [f"def {name}(subtotal, fragile_fee, total_discount):"]
+    lines.extend(_shipping_lines(rates, "    "))
+    lines.extend([
+        f"    tax = (subtotal - total_discount) * {_literal(tax_rate)}",
+        "    total = subtotal + shipping + fragile_fee + tax - total_discount",
+        "    if total < 0:",
+        "        total = 0.0",
+        "    return total",
+        "",
+    ])
+    return lines
+
+
+def generate_source(rules: RuleSnapshot) -> str:
+    """Generate the source of a pricing function with ``rules`` inlined.
+
+    The arithmetic mirrors InvoiceService.compute_total step by step so
+    that the generated function returns bit-identical totals.
+    """
+    tax_rates = dict(rules.tax_rates)
+    shipping_rates = dict(rules.shipping_rates)
+    lines: List[str] = []
+
+    # One kernel per country that has its own tax rate or shipping table
+    dispatch: Dict[str, str] = {}
+    for index, country in enumerate(sorted(set(tax_rates) | set(shipping_rates))):
+        name = f"_country_{index}"
+        dispatch[country] = name
+        lines.extend(_country_kernel(
+            name,
+            tax_rates.get(country, rules.default_tax_rate),
+            shipping_rates.get(country, rules.default_shipping_rates),
+        ))
+    lines.extend(_country_kernel("_country_default", rules.default_tax_rate, rules.default_shipping_rates))
+    entries = ", ".join(f"{_literal(country)}: {name}" for country, name in dispatch.items())
+    lines.append(f"_COUNTRIES = {{{entries}}}")
+    lines.append("")
+
+    lines.extend([
+        "def price(inv, rolling_spend=None, currencies=()):",
+        "    if inv is None:",
+        "        raise ValueError('Invoice is missing')",
+        "    problems = []",
+        "    if not inv.invoice_id:",
+        "        problems.append('Missing invoice_id')",
+        "    if not inv.customer_id:",
+        "        problems.append('Missing customer_id')",
+        "    items = inv.items",
+        "    if not items:",
+        "        problems.append('Invoice must contain items')",
+        "    subtotal = 0.0",
+        "    fragile_fee = 0.0",
+        "    for it in items:",
+        "        if not it.sku:",
+        "            problems.append('Item sku is missing')",
+        "        if it.qty <= 0:",
+        "            problems.append(f'Invalid qty for {it.sku}')",
+        "        if it.unit_price < 0:",
+        "            problems.append(f'Invalid price for {it.sku}')",
+        f"        if it.category not in {_literal(rules.valid_categories)}:",
+        "            problems.append(f'Unknown category for {it.sku}')",
+        "        subtotal += it.unit_price * it.qty",
+        "        if it.fragile:",
+        f"            fragile_fee += {_literal(rules.fragile_fee_per_unit)} * it.qty",
+        "    currency = inv.currency",
+        "    if currency is not None and currency not in currencies:",
+        "        problems.append(f'Unknown currency {currency}')",
+        "    if problems:",
+        "        raise ValueError('; '.join(problems))",
+        "    warnings = []",
+        "    membership = inv.membership",
+    ])
+
+    keyword = "if"
+    for membership, rate in rules.membership_discounts:
+        lines.append(f"    {keyword} membership == {_literal(membership)}:")
+        lines.append(f"        membership_discount = subtotal * {_literal(rate)}")
+        keyword = "elif"
+    lines.extend([
+        f"    {keyword} subtotal > {_literal(rules.bulk_discount_threshold)}:",
+        f"        membership_discount = {_literal(rules.bulk_discount)}",
+        "    else:",
+        "        membership_discount = 0.0",
+        "    code = inv.coupon",
+        "    if not code or not code.strip():",
+        "        coupon_discount = 0.0",
+        "    else:",
+        "        code = code.strip()",
+    ])
+    keyword = "if"
+    for code, rate in rules.coupon_rates:
+        lines.append(f"        {keyword} code == {_literal(code)}:")
+        lines.append(f"            coupon_discount = subtotal * {_literal(rate)}")
+        keyword = "elif"
+    if keyword == "if":
+        lines.append("        coupon_discount = 0.0")
+        lines.append("        warnings.append('Unknown coupon')")
+    else:
+        lines.append("        else:")
+        lines.append("            coupon_discount = 0.0")
+        lines.append("            warnings.append('Unknown coupon')")
+    lines.extend([
+        "    total = _COUNTRIES.get(inv.country, _country_default)(",
+        "        subtotal, fragile_fee, membership_discount + coupon_discount)",
+        f"    if membership not in {_literal(rules.upgrade_exempt_memberships)}:",
+        "        spend = subtotal",
+        "        if rolling_spend is not None:",
+        "            spend = subtotal + rolling_spend(inv.customer_id)"
+        + ("" if rules.currency_rate == 1.0 else f" * {_literal(rules.currency_rate)}"),
+        f"        if spend > {_literal(rules.upgrade_threshold)}:",
+        "            warnings.append('Consider membership upgrade')",
+        "    return total, warnings",
+        "",
+    ])
+    return "\n".join(lines)
+
+
+@lru_cache(maxsize=32)
+def compile_rules(rules: RuleSnapshot) -> PricingKernel:
+    """Compile (or fetch the cached) pricing function for ``rules``."""
+    source = generate_source(rules)
+    namespace: Dict[str, object] = {"_INF": math.inf, "_NAN": math.nan}
+    exec(compile(source, "<pricing-kernel>", "exec"), namespace)
+    return namespace["price"]  # type: ignore[return-value]
+
+
+def _bind(kernel: PricingKernel, service: InvoiceService, fx: Optional[FxRateTable] = None) -> PricingKernel:
+    """Attach the service's customer accounts and FX table (or ``fx``), if any, to ``kernel``."""
+    extra: Dict[str, object] = {}
+    if service.accounts is not None:
+        extra["rolling_spend"] = service.accounts.rolling_spend
+    if fx is None:
+        fx = service.fx
+    if fx is not None:
+        extra["currencies"] = fx
+    return partial(kernel, **extra) if extra else kernel
+
+
+class _CurrencyDispatch:
+    """Route invoices to kernels compiled with rules pre-converted per currency."""
+
+    def __init__(self, service: InvoiceService, rules: PricingRules) -> None:
+        self.service = service
+        self.rules = rules
+        self._compiled = compile_rules(rules.snapshot())
+        # (FX table, FX version, kernel per currency), swapped as a unit
+        self._state: Tuple[Optional[FxRateTable], Optional[str], Dict[Optional[str], PricingKernel]] = (
+            None, None, {}
+        )
+
+    def _kernel(self, currency: Optional[str]) -> PricingKernel:
+        # Kernels are bound to the table they were built from, so a replaced
+        # table (possibly with other currencies) starts a fresh cache
+        fx = self.service.fx
+        version = fx.version
+        state = self._state
+        if state[0] is not fx or state[1] != version:
+            base = _bind(self._compiled, self.service, fx)
+            state = (fx, version, {None: base, fx.base: base})
+            self._state = state
+        kernels = state[2]
+        kernel = kernels.get(currency)
+        if kernel is None:
+            if currency not in fx:
+                # The base kernel reports the unknown currency
+                return kernels[None]
+            kernel = _bind(compile_rules(self.rules.converted(fx.rate(currency)).snapshot()), self.service, fx)
+            kernels[currency] = kernel
+        return kernel
+
+    def __call__(self, inv: Invoice) -> Tuple[float, List[str]]:
+        return self._kernel(None if inv is None else inv.currency)(inv)
+
+
+def compile_pricing(service: InvoiceService) -> PricingKernel:
+    """Return a specialized equivalent of ``service.compute_total``."""
+    rules = service.rules
+    if service.fx is not None:
+        return _CurrencyDispatch(service, rules)
+    return _bind(compile_rules(rules.snapshot()), service)
+
+
+class CompiledPricer:
+    """Callable wrapper that keeps a compiled kernel in sync with its service."""
+
+    def __init__(self, service: Optional[InvoiceService] = None) -> None:
+        self.service = service if service is not None else InvoiceService()
+        self._inputs = self._current_inputs()
+        self._kernel = compile_pricing(self.service)
+
+    def _current_inputs(self) -> Tuple[object, ...]:
+        return self.service.rules, self.service.fx, self.service.accounts
+
+    def refresh(self) -> bool:
+        """Recompile if the service rules, FX table or accounts were replaced; return True if so."""
+        inputs = self._current_inputs()
+        if all(new is old for new, old in zip(inputs, self._inputs)):
+            return False
+        self._inputs = inputs
+        self._kernel = compile_pricing(self.service)
+        return True
+
+    def compute_total(self, inv: Invoice) -> Tuple[float, List[str]]:
+        return self._kernel(inv)
+
+    __call__ = compute_total
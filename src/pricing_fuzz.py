@@ -0,0 +1,316 @@
+"""Differential fuzzing of pricing engines against InvoiceService.compute_total.
+
+Invoices are generated around every money threshold in the rules (per
+currency), with edge-case coupons, memberships and countries, plus a
+share of deliberately invalid invoices. Each candidate engine must match
+the reference on totals (within a tolerance), warnings, and the type and
+message of any exception. Failures are shrunk to a minimal invoice.
+
+Run with ``PYTHONPATH=src python src/pricing_fuzz.py --cases 1000000``.
+"""
+import argparse
+import math
+import multiprocessing
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from customer_accounts import CustomerAccounts, SECONDS_PER_DAY
+from fx_rates import FxRateTable
+from invoice_service import Invoice, InvoiceService, LineItem
+from pricing_compiler import compile_pricing
+
+Engine = Callable[[Invoice], Tuple[float, List[str]]]
+# An engine checked against the shared reference, or a (reference, engine) pair
+Candidate = Union[Engine, Tuple[Engine, Engine]]
+
+DEFECTS = (
+    "qty_zero", "qty_negative", "negative_price", "empty_sku", "bad_category",
+    "no_items", "no_invoice_id", "no_customer_id", "bad_currency", "missing_invoice",
+)
+
+
+@dataclass(frozen=True)
+class Outcome:
+    total: Optional[float] = None
+    warnings: Tuple[str, ...] = ()
+    error: Optional[str] = None
+
+
+@dataclass
+class Mismatch:
+    engine: str
+    case: int
+    invoice: Optional[Invoice]
+    expected: Outcome
+    actual: Outcome
+
+
+def run_engine(engine: Engine, inv: Optional[Invoice]) -> Outcome:
+    try:
+        total, warnings = engine(inv)
+    except Exception as exc:
+        return Outcome(error=f"{type(exc).__name__}: {exc}")
+    return Outcome(total=total, warnings=tuple(warnings))
+
+
+def same_outcome(expected: Outcome, actual: Outcome, rel_tol: float = 1e-9, abs_tol: float = 1e-9) -> bool:
+    if expected.error is not None or actual.error is not None:
+        return expected.error == actual.error
+    return expected.warnings == actual.warnings and math.isclose(
+        expected.total, actual.total, rel_tol=rel_tol, abs_tol=abs_tol
+    )
+
+
+class InvoiceGenerator:
+    """Random invoices biased towards the rule boundaries of ``service``."""
+
+    def __init__(self, service: InvoiceService, invalid_rate: float = 0.15) -> None:
+        rules = service.rules
+        fx = service.fx
+        self.invalid_rate = invalid_rate
+        self.countries = sorted(set(rules.TAX_RATES) | set(rules.SHIPPING_RATES)) + ["XX", ""]
+        self.memberships = sorted(set(rules.MEMBERSHIP_DISCOUNTS) | set(rules.UPGRADE_EXEMPT_MEMBERSHIPS))
+        self.memberships += ["none", "", self.memberships[0].upper() if self.memberships else "GOLD"]
+        codes = sorted(rules.COUPON_RATES)
+        self.coupons = [None, "", "   ", "\t", "BOGUS"] + codes
+        self.coupons += [f"  {code} " for code in codes] + [code.lower() for code in codes]
+        self.currencies: List[Optional[str]] = [None] + (sorted(fx.rates) if fx is not None else [])
+        self.categories = list(rules.VALID_CATEGORIES)
+
+        # Every finite money threshold in the base currency
+        thresholds = {rules.BULK_DISCOUNT_THRESHOLD, rules.UPGRADE_THRESHOLD}
+        for tiers in list(rules.SHIPPING_RATES.values()) + [rules.DEFAULT_SHIPPING_RATES]:
+            thresholds.update(t for t, _ in tiers if math.isfinite(t))
+        self.targets: Dict[Optional[str], List[float]] = {}
+        for currency in self.currencies:
+            converted = rules if currency is None else rules.converted(fx.rate(currency))
+            values = set()
+            for base_threshold in thresholds:
+                t = base_threshold * converted.RATE
+                values.update((t, math.nextafter(t, -math.inf), math.nextafter(t, math.inf), t - 0.01, t + 0.01))
+            self.targets[currency] = sorted(v for v in values if v >= 0)
+        self.max_target = max(thresholds) * 2
+
+    def _items(self, rng: random.Random, subtotal: float) -> List[LineItem]:
+        count = rng.choice((1, 1, 1, 2, 3, 4)) if rng.random() > 0.01 else rng.randint(20, 60)
+        items = []
+        remaining = subtotal
+        for index in range(count - 1):
+            qty = rng.randint(1, 3)
+            price = round(rng.uniform(0, remaining / (count - index) / qty), 2)
+            remaining -= price * qty
+            items.append(LineItem(f"S{index}", rng.choice(self.categories), price, qty, rng.random() < 0.3))
+        # The last line absorbs the remainder so the subtotal lands on the target
+        items.append(LineItem(f"S{count}", rng.choice(self.categories), max(remaining, 0.0), 1, rng.random() < 0.3))
+        return items
+
+    def invoice(self, rng: random.Random) -> Optional[Invoice]:
+        currency = rng.choice(self.currencies)
+        if rng.random() < 0.6:
+            subtotal = rng.choice(self.targets[currency])
+        else:
+            subtotal = round(rng.uniform(0, self.max_target), rng.choice((0, 2)))
+            if currency is not None:
+                subtotal *= rng.uniform(0.01, 10)
+        inv = Invoice(
+            invoice_id="I-1",
+            customer_id=f"C-{rng.randint(0, 9)}",
+            country=rng.choice(self.countries),
+            membership=rng.choice(self.memberships),
+            coupon=rng.choice(self.coupons),
+            items=self._items(rng, subtotal),
+            currency=currency,
+        )
+        if rng.random() < self.invalid_rate:
+            return self._break(rng, inv)
+        return inv
+
+    def _break(self, rng: random.Random, inv: Invoice) -> Optional[Invoice]:
+        defect = rng.choice(DEFECTS)
+        item = rng.randrange(len(inv.items))
+        if defect == "missing_invoice":
+            return None
+        if defect == "no_items":
+            return replace(inv, items=[])
+        if defect == "no_invoice_id":
+            return replace(inv, invoice_id="")
+        if defect == "no_customer_id":
+            return replace(inv, customer_id="")
+        if defect == "bad_currency":
+            return replace(inv, currency="ZZZ")
+        changes = {
+            "qty_zero": {"qty": 0},
+            "qty_negative": {"qty": -rng.randint(1, 5)},
+            "negative_price": {"unit_price": -0.01},
+            "empty_sku": {"sku": ""},
+            "bad_category": {"category": "toys"},
+        }[defect]
+        items = list(inv.items)
+        items[item] = replace(items[item], **changes)
+        return replace(inv, items=items)
+
+
+def _simpler_invoices(inv: Invoice) -> List[Invoice]:
+    """Candidate one-step simplifications of ``inv``, simplest first."""
+    candidates = [replace(inv, items=inv.items[:i] + inv.items[i + 1:]) for i in range(len(inv.items))]
+    # Fold neighbouring lines into one so a subtotal spread over many items can shrink
+    for i in range(len(inv.items) - 1):
+        first, second = inv.items[i], inv.items[i + 1]
+        merged = replace(first, unit_price=first.unit_price * first.qty + second.unit_price * second.qty, qty=1)
+        candidates.append(replace(inv, items=inv.items[:i] + [merged] + inv.items[i + 2:]))
+    for field, value in (("coupon", None), ("membership", "none"), ("currency", None),
+                         ("country", "TH"), ("customer_id", "C-1"), ("invoice_id", "I-1")):
+        if getattr(inv, field) != value:
+            candidates.append(replace(inv, **{field: value}))
+    for i, it in enumerate(inv.items):
+        simpler = []
+        if it.fragile:
+            simpler.append(replace(it, fragile=False))
+        if it.qty > 1:
+            simpler.append(replace(it, qty=1, unit_price=it.unit_price * it.qty))
+        for price in (0.0, float(round(it.unit_price)), round(it.unit_price, 2)):
+            if price != it.unit_price and price >= 0:
+                simpler.append(replace(it, unit_price=price))
+        for field, value in (("sku", "A"), ("category", "book")):
+            if getattr(it, field) != value and getattr(it, field):
+                simpler.append(replace(it, **{field: value}))
+        candidates.extend(replace(inv, items=inv.items[:i] + [s] + inv.items[i + 1:]) for s in simpler)
+    return candidates
+
+
+def shrink(
+    inv: Optional[Invoice],
+    fails: Callable[[Optional[Invoice]], bool],
+    max_steps: int = 1000,
+) -> Optional[Invoice]:
+    """Greedily simplify ``inv`` while ``fails`` stays true."""
+    if inv is None:
+        return inv
+    for _ in range(max_steps):
+        for candidate in _simpler_invoices(inv):
+            if fails(candidate):
+                inv = candidate
+                break
+        else:
+            return inv
+    return inv
+
+
+def fuzz(
+    reference: Engine,
+    candidates: Dict[str, Candidate],
+    generator: InvoiceGenerator,
+    cases: int,
+    seed: int = 0,
+    start: int = 0,
+    rel_tol: float = 1e-9,
+    abs_tol: float = 1e-9,
+    max_failures: int = 10,
+) -> List[Mismatch]:
+    """Run ``cases`` generated invoices through every engine; return shrunk mismatches.
+
+    A candidate given as a ``(reference, engine)`` pair is checked against
+    its own reference instead of the shared one.
+    """
+    rng = random.Random(seed * 2 ** 32 + start)
+    mismatches: List[Mismatch] = []
+    for case in range(start, start + cases):
+        inv = generator.invoice(rng)
+        expected_by_reference: Dict[Engine, Outcome] = {}
+        for name, candidate in candidates.items():
+            ref, engine = candidate if isinstance(candidate, tuple) else (reference, candidate)
+            expected = expected_by_reference.get(ref)
+            if expected is None:
+                expected = expected_by_reference[ref] = run_engine(ref, inv)
+            if same_outcome(expected, run_engine(engine, inv), rel_tol, abs_tol):
+                continue
+
+            def fails(candidate: Optional[Invoice], ref: Engine = ref, engine: Engine = engine) -> bool:
+                return not same_outcome(run_engine(ref, candidate), run_engine(engine, candidate), rel_tol, abs_tol)
+
+            small = shrink(inv, fails)
+            mismatches.append(Mismatch(name, case, small, run_engine(ref, small), run_engine(engine, small)))
+            if len(mismatches) >= max_failures:
+                return mismatches
+    return mismatches
+
+
+def default_engines(
+    executor: Optional[ThreadPoolExecutor] = None,
+) -> Tuple[Engine, Dict[str, Candidate], InvoiceGenerator]:
+    """Reference and the optimized engines in this package.
+
+    The reference service uses FX and customer accounts. Candidates are
+    the compiled kernel, the thread-pool batch path, the report-currency
+    batch path (converted back into the invoice's currency) and the
+    compiled kernel of a service without FX, checked against that
+    service's own compute_total. Without ``executor`` the threaded engine
+    starts its own two-thread pool.
+    """
+    def make_service(fx: bool = True) -> InvoiceService:
+        accounts = CustomerAccounts(clock=lambda: 1000 * SECONDS_PER_DAY)
+        for i in range(10):
+            accounts.record(f"C-{i}", 1500.0 * i)
+        if not fx:
+            return InvoiceService(accounts=accounts)
+        table = FxRateTable("THB", {"USD": 0.028, "JPY": 4.1, "EUR": 0.026}, version="fuzz")
+        return InvoiceService(accounts=accounts, fx=table)
+
+    reference = make_service()
+    candidate = make_service()
+    plain = make_service(fx=False)
+    pool = executor if executor is not None else ThreadPoolExecutor(max_workers=2)
+
+    def threaded(inv: Invoice) -> Tuple[float, List[str]]:
+        return candidate.compute_totals_threaded([inv], executor=pool)[0]
+
+    def report_currency(inv: Invoice) -> Tuple[float, List[str]]:
+        total, warnings = candidate.compute_totals([inv], report_currency="USD")[0]
+        return candidate.fx.convert(total, "USD", inv.currency), warnings
+
+    engines: Dict[str, Candidate] = {
+        "compiled": compile_pricing(candidate),
+        "threaded": threaded,
+        "report_currency": report_currency,
+        "compiled_no_fx": (plain.compute_total, compile_pricing(plain)),
+    }
+    return reference.compute_total, engines, InvoiceGenerator(reference)
+
+
+def _run_range(args: Tuple[int, int, int]) -> Tuple[int, List[Mismatch]]:
+    seed, start, count = args
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        reference, candidates, generator = default_engines(executor)
+        return count, fuzz(reference, candidates, generator, count, seed=seed, start=start)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--chunk", type=int, default=50000)
+    args = parser.parse_args(argv)
+
+    ranges = [(args.seed, start, min(args.chunk, args.cases - start)) for start in range(0, args.cases, args.chunk)]
+    began = time.perf_counter()
+    if args.workers > 1:
+        with multiprocessing.Pool(args.workers) as pool:
+            parts = pool.map(_run_range, ranges)
+    else:
+        parts = [_run_range(r) for r in ranges]
+    elapsed = time.perf_counter() - began
+
+    mismatches = [m for _, part in parts for m in part]
+    done = sum(count for count, _ in parts)
+    print(f"{done:,} cases in {elapsed:.1f}s ({done / elapsed:,.0f} cases/s), {len(mismatches)} mismatches")
+    for m in mismatches:
+        print(f"\n[{m.engine}] case {m.case}\n  invoice:  {m.invoice!r}\n  expected: {m.expected}\n  actual:   {m.actual}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
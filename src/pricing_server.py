@@ -0,0 +1,241 @@
+"""Minimal asyncio HTTP/1.1 server exposing a shared, warm InvoiceService.
+
+Endpoints:
+
+* ``POST /price`` with one invoice object
+* ``POST /price/batch`` with ``{"invoices": [...]}``
+* ``GET /health``
+
+Invoices use the compact JSON form from ``invoice_codec``.
+Connections are kept alive until the client closes them or sends
+``Connection: close``. Requests beyond ``queue_size`` are answered with
+503 instead of piling up.
+
+Run with ``PYTHONPATH=src python src/pricing_server.py --port 8080``.
+"""
+import argparse
+import asyncio
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from invoice_codec import decode_invoice
+from invoice_service import InvoiceService
+from pricing_compiler import CompiledPricer
+
+MAX_BODY = 8 * 1024 * 1024
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    422: "Unprocessable Entity",
+    431: "Request Header Fields Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class BadRequest(Exception):
+    """Malformed HTTP request or payload."""
+
+    def __init__(self, message: str, status: int = 400) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class PricingServer:
+    """Serve pricing requests from one shared InvoiceService."""
+
+    def __init__(
+        self,
+        service: Optional[InvoiceService] = None,
+        host: str = "127.0.0.1",
+        port: int = 8080,
+        queue_size: int = 1024,
+    ) -> None:
+        self.pricer = CompiledPricer(service)
+        self.host = host
+        self.port = port
+        self.queue_size = queue_size
+        self._queue: Optional["asyncio.Queue[Tuple[str, Any, asyncio.Future]]"] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._worker: Optional["asyncio.Task[None]"] = None
+
+    @property
+    def service(self) -> InvoiceService:
+        return self.pricer.service
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._worker = asyncio.create_task(self._work())
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        # Resolve port 0 to the port actually bound
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._worker is not None:
+            self._worker.cancel()
+
+    def _price(self, obj: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            total, warnings = self.pricer(decode_invoice(obj))
+        except ValueError as exc:
+            return {"error": str(exc)}
+        return {"total": total, "warnings": warnings}
+
+    def _dispatch(self, path: str, payload: Any) -> Tuple[int, Any]:
+        if path == "/price":
+            if not isinstance(payload, dict):
+                raise BadRequest("Expected an invoice object")
+            result = self._price(payload)
+            return (422 if "error" in result else 200), result
+        invoices = payload.get("invoices") if isinstance(payload, dict) else None
+        if not isinstance(invoices, list):
+            raise BadRequest("Expected {\"invoices\": [...]}")
+        return 200, {"results": [
+            self._price(obj) if isinstance(obj, dict) else {"error": "Expected an invoice object"}
+            for obj in invoices
+        ]}
+
+    async def _work(self) -> None:
+        """Price queued requests one at a time on the event loop.
+
+        Rule changes made through ``server.service`` are picked up before
+        each request. Any failure is answered rather than allowed to end
+        this task, which would leave later requests queued forever.
+        """
+        while True:
+            path, payload, future = await self._queue.get()
+            if not future.cancelled():
+                try:
+                    self.pricer.refresh()
+                    future.set_result(self._dispatch(path, payload))
+                except BadRequest as exc:
+                    future.set_result((exc.status, {"error": str(exc)}))
+                except Exception as exc:
+                    future.set_result((500, {"error": f"Internal error: {type(exc).__name__}"}))
+            self._queue.task_done()
+
+    async def _submit(self, path: str, payload: Any) -> Tuple[int, Any]:
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((path, payload, future))
+        except asyncio.QueueFull:
+            return 503, {"error": "Server busy"}
+        return await future
+
+    async def _route(self, method: str, path: str, body: bytes) -> Tuple[int, Any]:
+        if path == "/health":
+            return 200, {"status": "ok", "queued": self._queue.qsize()}
+        if path not in ("/price", "/price/batch"):
+            return 404, {"error": "Not found"}
+        if method != "POST":
+            return 405, {"error": "Use POST"}
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return 400, {"error": "Invalid JSON"}
+        return await self._submit(path, payload)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except BadRequest as exc:
+                    _write_response(writer, exc.status, {"error": str(exc)}, keep_alive=False)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, path, keep_alive, body = request
+                status, result = await self._route(method, path, body)
+                _write_response(writer, status, result, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def _readline(reader: asyncio.StreamReader, message: str, status: int) -> bytes:
+    try:
+        return await reader.readline()
+    except ValueError:
+        # Raised in place of LimitOverrunError once a line exceeds the stream limit
+        raise BadRequest(message, status) from None
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, bool, bytes]]:
+    """Read one request; None when the client closed the connection."""
+    line = await _readline(reader, "Request line too long", 400)
+    if not line:
+        return None
+    try:
+        method, path, version = line.decode("latin-1").split()
+    except ValueError:
+        raise BadRequest("Malformed request line") from None
+    headers: Dict[str, str] = {}
+    while True:
+        header = await _readline(reader, "Request header too large", 431)
+        if header in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = header.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length", "0"))
+    except ValueError:
+        raise BadRequest("Invalid Content-Length") from None
+    if length < 0:
+        raise BadRequest("Invalid Content-Length")
+    if length > MAX_BODY:
+        raise BadRequest("Request body too large", 413)
+    body = await reader.readexactly(length) if length else b""
+    connection = headers.get("connection", "").lower()
+    if version == "HTTP/1.0":
+        keep_alive = connection == "keep-alive"
+    else:
+        keep_alive = connection != "close"
+    return method, path, keep_alive, body
+
+
+def _write_response(writer: asyncio.StreamWriter, status: int, result: Any, keep_alive: bool) -> None:
+    body = json.dumps(result, separators=(",", ":")).encode()
+    writer.write(
+        f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+        f"Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+        "\r\n".encode("latin-1")
+        + body
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--queue-size", type=int, default=1024)
+    args = parser.parse_args(argv)
+    server = PricingServer(host=args.host, port=args.port, queue_size=args.queue_size)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+import pytest
+import sys
+sys.path.insert(0, '/workspaces/static_analysis_lab/src')
+
+from invoice_service import Invoice, LineItem
+
+
+@pytest.fixture
+def make_invoice():
+    """Factory for a one-line invoice; keyword arguments override the defaults.
+
+    ``unit_price``, ``qty``, ``category`` and ``fragile`` set the line item,
+    anything else is passed to Invoice.
+    """
+    def make(unit_price=100.0, qty=1, category="book", fragile=False, **fields):
+        values = dict(invoice_id="I-001", customer_id="C-001", country="TH", membership="none", coupon=None)
+        values.update(fields)
+        return Invoice(
+            items=[LineItem(sku="A", category=category, unit_price=unit_price, qty=qty, fragile=fragile)],
+            **values,
+        )
+    return make
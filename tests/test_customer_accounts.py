@@ -0,0 +1,142 @@
+import sqlite3
+import pytest
+import sys
+sys.path.insert(0, '/workspaces/static_analysis_lab/src')
+
+from customer_accounts import CustomerAccounts, SECONDS_PER_DAY
+from invoice_service import InvoiceService
+from pricing_compiler import compile_pricing
+
+
+# ===== Rolling window tests =====
+def test_rolling_spend_unknown_customer():
+    """Test unknown customers have no spend"""
+    accounts = CustomerAccounts()
+    assert accounts.rolling_spend("C-404", day=100) == 0.0
+
+
+def test_rolling_spend_windows():
+    """Test spend is summed per window and expires after it"""
+    accounts = CustomerAccounts(windows=(30, 90))
+    accounts.record("C-001", 100.0, day=1000)
+    accounts.record("C-001", 50.0, day=1040)
+    assert accounts.rolling_spend("C-001", window=30, day=1040) == 50.0
+    assert accounts.rolling_spend("C-001", window=90, day=1040) == 150.0
+    assert accounts.rolling_spend("C-001", window=90, day=1089) == 150.0
+    assert accounts.rolling_spend("C-001", window=90, day=1090) == 50.0
+    assert accounts.rolling_spend("C-001", window=90, day=2000) == 0.0
+
+
+def test_record_late_invoice():
+    """Test an invoice for an earlier day only counts in windows covering it"""
+    accounts = CustomerAccounts(windows=(30, 90))
+    accounts.record("C-001", 10.0, day=1000)
+    accounts.record("C-001", 5.0, day=960)
+    accounts.record("C-001", 7.0, day=800)
+    assert accounts.rolling_spend("C-001", window=30, day=1000) == 10.0
+    assert accounts.rolling_spend("C-001", window=90, day=1000) == 15.0
+
+
+def test_rolling_spend_rejects_earlier_day():
+    """Test lookups cannot go back before the latest day recorded, and do not move it"""
+    accounts = CustomerAccounts(windows=(30, 90))
+    accounts.record("C-001", 10.0, day=1000)
+    assert accounts.rolling_spend("C-001", window=30, day=1040) == 0.0
+    assert accounts.rolling_spend("C-001", window=30, day=1010) == 10.0
+    accounts.record("C-001", 5.0, day=1020)
+    with pytest.raises(ValueError, match="before the last day"):
+        accounts.rolling_spend("C-001", day=1015)
+
+
+def test_default_day_never_before_last_recorded_day(make_invoice):
+    """Test clock-based lookups after a record dated later than today still succeed"""
+    accounts = CustomerAccounts(clock=lambda: 1000 * SECONDS_PER_DAY)
+    accounts.record("C-001", 9500.0, day=1001)
+    assert accounts.rolling_spend("C-001") == 9500.0
+    _, warnings = InvoiceService(accounts=accounts).compute_total(make_invoice(unit_price=1000.0))
+    assert "Consider membership upgrade" in warnings
+
+
+def test_spend_kept_in_cents():
+    """Test repeated fractional amounts sum exactly"""
+    accounts = CustomerAccounts()
+    for _ in range(1000):
+        accounts.record("C-001", 0.1, day=1000)
+    assert accounts.rolling_spend("C-001", day=1000) == 100.0
+
+
+def test_default_day_uses_clock():
+    """Test days are derived from the injected clock"""
+    now = [10 * SECONDS_PER_DAY]
+    accounts = CustomerAccounts(clock=lambda: now[0])
+    accounts.record("C-001", 10.0)
+    now[0] += 95 * SECONDS_PER_DAY
+    assert accounts.rolling_spend("C-001") == 0.0
+
+
+def test_invalid_windows():
+    """Test window configuration is validated"""
+    with pytest.raises(ValueError):
+        CustomerAccounts(windows=())
+    with pytest.raises(ValueError):
+        CustomerAccounts(windows=(30, 90), default_window=7)
+
+
+# ===== Persistence tests =====
+def test_save_and_load(tmp_path):
+    """Test accounts round-trip through the SQLite store"""
+    path = str(tmp_path / "accounts.db")
+    accounts = CustomerAccounts(windows=(30, 90), default_window=30)
+    accounts.record("C-001", 100.0, day=1000)
+    accounts.record("C-002", 25.0, day=990)
+    accounts.save(path)
+
+    loaded = CustomerAccounts.load(path)
+    assert len(loaded) == 2
+    assert loaded.default_window == 30
+    assert loaded.rolling_spend("C-001", day=1000) == 100.0
+    assert loaded.rolling_spend("C-002", window=90, day=1000) == 25.0
+
+
+def test_load_rejects_bad_bucket_data(tmp_path):
+    """Test a bucket blob of the wrong size is refused on load"""
+    path = str(tmp_path / "accounts.db")
+    accounts = CustomerAccounts()
+    accounts.record("C-001", 100.0, day=1000)
+    accounts.save(path)
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE accounts SET buckets = ? WHERE customer_id = 'C-001'", (b"\0" * 7,))
+    conn.close()
+    with pytest.raises(ValueError, match="Bad bucket data for C-001"):
+        CustomerAccounts.load(path)
+
+
+# ===== compute_total integration tests =====
+def test_upgrade_warning_from_rolling_spend(make_invoice):
+    """Test upgrade is suggested once cumulative spend crosses the threshold"""
+    accounts = CustomerAccounts(clock=lambda: 1000 * SECONDS_PER_DAY)
+    service = InvoiceService(accounts=accounts)
+    _, warnings = service.compute_total(make_invoice(unit_price=1000.0))
+    assert "Consider membership upgrade" not in warnings
+
+    accounts.record("C-001", 9500.0)
+    _, warnings = service.compute_total(make_invoice(unit_price=1000.0))
+    assert "Consider membership upgrade" in warnings
+
+
+def test_upgrade_warning_skipped_for_members(make_invoice):
+    """Test members are never nudged regardless of spend"""
+    accounts = CustomerAccounts(clock=lambda: 1000 * SECONDS_PER_DAY)
+    accounts.record("C-001", 50000.0)
+    service = InvoiceService(accounts=accounts)
+    _, warnings = service.compute_total(make_invoice(unit_price=1000.0, membership="gold"))
+    assert "Consider membership upgrade" not in warnings
+
+
+def test_compiled_kernel_uses_accounts(make_invoice):
+    """Test compiled kernels consult the same customer accounts"""
+    accounts = CustomerAccounts(clock=lambda: 1000 * SECONDS_PER_DAY)
+    accounts.record("C-001", 9500.0)
+    service = InvoiceService(accounts=accounts)
+    inv = make_invoice(unit_price=1000.0)
+    assert compile_pricing(service)(inv) == service.compute_total(inv)
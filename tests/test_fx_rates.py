@@ -0,0 +1,148 @@
+import json
+import os
+import random
+import pytest
+import sys
+sys.path.insert(0, '/workspaces/static_analysis_lab/src')
+
+from customer_accounts import CustomerAccounts, SECONDS_PER_DAY
+from fx_rates import FxRateTable
+from invoice_service import InvoiceService
+from pricing_compiler import CompiledPricer, compile_pricing
+
+
+def _table():
+    return FxRateTable("THB", {"USD": 0.025, "JPY": 4.0}, version="v1")
+
+
+# ===== Rate table tests =====
+def test_load_and_reload(tmp_path):
+    """Test tables load from JSON and reload bumps the version"""
+    path = tmp_path / "fx.json"
+    path.write_text(json.dumps({"base": "THB", "rates": {"USD": 0.025}}))
+    table = FxRateTable.load(str(path))
+    assert table.rate("USD") == 0.025
+    assert table.rate("THB") == 1.0
+    assert table.reload() is False
+
+    version = table.version
+    path.write_text(json.dumps({"base": "THB", "rates": {"USD": 0.03}}))
+    os.utime(path, (0, 12345))
+    assert table.reload() is True
+    assert table.version != version
+    assert table.rate("USD") == 0.03
+
+
+def test_invalid_rate():
+    """Test non-positive rates are rejected"""
+    with pytest.raises(ValueError):
+        FxRateTable("THB", {"USD": 0.0})
+
+
+def test_unknown_currency():
+    """Test looking up an unknown currency raises ValueError"""
+    with pytest.raises(ValueError, match="Unknown currency EUR"):
+        _table().rate("EUR")
+
+
+def test_convert_batch_matches_convert():
+    """Test batch conversion agrees with one-at-a-time conversion"""
+    table = _table()
+    amounts = [10.0, 250.0, 4000.0, 7.5]
+    currencies = ["USD", None, "JPY", "THB"]
+    expected = [table.convert(a, c, "USD") for a, c in zip(amounts, currencies)]
+    assert table.convert_batch(amounts, currencies, "USD") == expected
+
+
+# ===== Pricing tests =====
+def test_thresholds_are_converted(make_invoice):
+    """Test shipping thresholds apply in the invoice currency"""
+    service = InvoiceService(fx=_table())
+    # TH charges 60 THB == 240 JPY from 500 THB == 2000 JPY up
+    below, _ = service.compute_total(make_invoice(currency="JPY", unit_price=1999.0))
+    above, _ = service.compute_total(make_invoice(currency="JPY", unit_price=2000.0))
+    assert below == pytest.approx(1999.0 * 1.07)
+    assert above == pytest.approx(2000.0 * 1.07 + 240.0)
+
+
+def test_upgrade_threshold_is_converted(make_invoice):
+    """Test the upgrade threshold is compared in the invoice currency"""
+    service = InvoiceService(fx=_table())
+    _, warnings = service.compute_total(make_invoice(currency="USD", unit_price=300.0))
+    assert "Consider membership upgrade" in warnings
+
+
+def test_unknown_invoice_currency_raises(make_invoice):
+    """Test invoices in currencies missing from the table are rejected"""
+    with pytest.raises(ValueError, match="Unknown currency EUR"):
+        InvoiceService(fx=_table()).compute_total(make_invoice(currency="EUR"))
+    with pytest.raises(ValueError, match="Unknown currency USD"):
+        InvoiceService().compute_total(make_invoice(currency="USD"))
+
+
+def test_converted_rules_follow_table_version(make_invoice):
+    """Test cached conversions are rebuilt when the table version changes"""
+    table = _table()
+    service = InvoiceService(fx=table)
+    first, _ = service.compute_total(make_invoice(currency="USD", unit_price=20.0))
+    table.rates["USD"] = 0.05
+    table.version = "v2"
+    second, _ = service.compute_total(make_invoice(currency="USD", unit_price=20.0))
+    assert first != second
+
+
+def test_compute_totals_report_currency(make_invoice):
+    """Test batch totals are converted to the report currency"""
+    table = _table()
+    service = InvoiceService(fx=table)
+    invoices = [
+        make_invoice(),
+        make_invoice(currency="USD", unit_price=5.0),
+        make_invoice(currency="JPY", unit_price=800.0),
+    ]
+    results = service.compute_totals(invoices, report_currency="THB")
+    for inv, (total, warnings) in zip(invoices, results):
+        local_total, local_warnings = service.compute_total(inv)
+        assert total == table.convert(local_total, inv.currency, "THB")
+        assert warnings == local_warnings
+
+
+def test_compiled_matches_compute_total_with_currencies(make_invoice):
+    """Test compiled kernels agree with compute_total across currencies"""
+    accounts = CustomerAccounts(clock=lambda: 1000 * SECONDS_PER_DAY)
+    accounts.record("C-001", 6000.0)
+    service = InvoiceService(accounts=accounts, fx=_table())
+    kernel = compile_pricing(service)
+    rng = random.Random(7)
+    for _ in range(2000):
+        inv = make_invoice(
+            currency=rng.choice([None, "THB", "USD", "JPY", "EUR"]),
+            unit_price=rng.choice([1.0, 12.5, 80.0, 500.0, 2000.0, 16000.0]),
+            qty=rng.randint(1, 4),
+            country=rng.choice(["TH", "JP", "US", "XX"]),
+            membership=rng.choice(["none", "gold"]),
+        )
+        try:
+            expected = service.compute_total(inv)
+        except ValueError as exc:
+            with pytest.raises(ValueError, match=str(exc)):
+                kernel(inv)
+            continue
+        assert kernel(inv) == expected
+
+
+def test_compiled_kernel_uses_replaced_table(make_invoice):
+    """Test compiled pricing rejects a currency the replacement FX table lacks"""
+    service = InvoiceService(fx=_table())
+    pricer = CompiledPricer(service)
+    inv = make_invoice(currency="USD", unit_price=20.0)
+    assert pricer(inv) == service.compute_total(inv)
+
+    service.fx = FxRateTable("THB", {"JPY": 4.0})
+    with pytest.raises(ValueError, match="Unknown currency USD"):
+        service.compute_total(inv)
+    with pytest.raises(ValueError, match="Unknown currency USD"):
+        pricer(inv)
+    assert pricer.refresh() is True
+    with pytest.raises(ValueError, match="Unknown currency USD"):
+        pricer(inv)
@@ -0,0 +1,96 @@
+import json
+import os
+import pytest
+import sys
+sys.path.insert(0, '/workspaces/static_analysis_lab/src')
+
+from invoice_service import InvoiceService
+from latency_profiler import LatencyHistogram, ProfiledPricer, load_corpus
+
+
+# ===== Histogram tests =====
+def test_histogram_exact_for_small_values():
+    """Test small latencies are counted exactly"""
+    histogram = LatencyHistogram()
+    for value in range(1, 101):
+        histogram.record(value)
+    assert histogram.percentile(50) == 50
+    assert histogram.percentile(99) == 99
+    assert histogram.percentile(100) == 100
+
+
+def test_histogram_relative_error():
+    """Test large latencies stay within the bucket precision"""
+    histogram = LatencyHistogram(sub_bucket_bits=7)
+    values = [int(1.37 ** k) for k in range(20, 60)]
+    for value in values:
+        histogram.record(value)
+    for percent in (10, 50, 90):
+        exact = sorted(values)[max(0, -(-len(values) * percent // 100) - 1)]
+        assert histogram.percentile(percent) == pytest.approx(exact, rel=2 ** -6)
+    assert histogram.min == min(values)
+    assert histogram.max == max(values)
+
+
+def test_histogram_empty():
+    """Test an empty histogram reports zero"""
+    assert LatencyHistogram().percentile(99) == 0
+
+
+# ===== Profiler tests =====
+def test_profiler_returns_pricer_result(make_invoice):
+    """Test profiling does not change results"""
+    profiler = ProfiledPricer(InvoiceService().compute_total)
+    assert profiler(make_invoice(country="XX")) == InvoiceService().compute_total(make_invoice(country="XX"))
+    assert profiler.histogram.count == 1
+
+
+def test_slow_invoices_are_captured_in_ring_buffer(make_invoice):
+    """Test invoices above the threshold are kept, up to capacity"""
+    profiler = ProfiledPricer(slow_threshold_ms=0, capacity=3)
+    for qty in range(1, 6):
+        profiler(make_invoice(qty=qty, country="XX"))
+    assert [entry["invoice"]["items"][0][3] for entry in profiler.slow] == [3, 4, 5]
+
+
+def test_failing_calls_are_recorded(make_invoice):
+    """Test rejected invoices are timed and captured before re-raising"""
+    profiler = ProfiledPricer(slow_threshold_ms=0)
+    with pytest.raises(ValueError):
+        profiler(make_invoice(qty=0, country="XX"))
+    assert profiler.histogram.count == 1
+    assert len(profiler.slow) == 1
+
+
+def test_sample_rate_zero_skips_timing(make_invoice):
+    """Test unsampled calls are not recorded"""
+    profiler = ProfiledPricer(slow_threshold_ms=0, sample_rate=0.0)
+    profiler(make_invoice(country="XX"))
+    assert profiler.histogram.count == 0
+    assert not profiler.slow
+
+
+def test_cprofile_fraction(make_invoice):
+    """Test profiled calls accumulate cProfile stats"""
+    profiler = ProfiledPricer(cprofile_fraction=1.0)
+    profiler(make_invoice(country="XX"))
+    profiler(make_invoice(country="XX"))
+    assert profiler.stats is not None
+    assert profiler.histogram.count == 0
+
+
+# ===== Corpus tests =====
+def test_dump_and_replay(tmp_path, make_invoice):
+    """Test dumped corpora reload as the captured invoices"""
+    profiler = ProfiledPricer(slow_threshold_ms=0, cprofile_fraction=0.5, seed=3)
+    invoices = [make_invoice(qty=qty, country="XX") for qty in range(1, 20)]
+    for inv in invoices:
+        profiler(inv)
+    profiler.dump(str(tmp_path))
+
+    replayed = load_corpus(str(tmp_path / "corpus.jsonl"))
+    assert replayed == [inv for inv in invoices if inv.items[0].qty in
+                        [entry["invoice"]["items"][0][3] for entry in profiler.slow]]
+    summary = json.loads((tmp_path / "histogram.json").read_text())
+    assert summary["count"] == profiler.histogram.count
+    assert os.path.exists(tmp_path / "profile.pstats")
@@ -0,0 +1,105 @@
+import random
+import pytest
+import sys
+sys.path.insert(0, '/workspaces/static_analysis_lab/src')
+
+from invoice_service import InvoiceService, Invoice, LineItem
+from pricing_compiler import CompiledPricer, compile_pricing, compile_rules, generate_source
+
+PRICES = [0.0, 1.0, 19.99, 50.0, 99.5, 100.0, 150.0, 300.0, 500.0, 1000.0, 3000.0, 4000.0, -1.0]
+CATEGORIES = ["book", "food", "electronics", "other", "toys"]
+COUPONS = [None, "", "   ", "WELCOME10", " VIP20 ", "STUDENT5", "BOGUS"]
+
+
+def _random_invoice(rng):
+    items = [
+        LineItem(
+            sku=rng.choice(["A", "B", ""]),
+            category=rng.choice(CATEGORIES),
+            unit_price=rng.choice(PRICES + [round(rng.uniform(0, 5000), 2)]),
+            qty=rng.choice([-1, 0, 1, 2, 3, 10]),
+            fragile=rng.random() < 0.3,
+        )
+        for _ in range(rng.randint(0, 4))
+    ]
+    return Invoice(
+        invoice_id=rng.choice(["I-001", ""]),
+        customer_id=rng.choice(["C-001", ""]),
+        country=rng.choice(["TH", "JP", "US", "XX"]),
+        membership=rng.choice(["none", "gold", "platinum"]),
+        coupon=rng.choice(COUPONS),
+        items=items,
+    )
+
+
+def _outcome(price, inv):
+    try:
+        return price(inv)
+    except ValueError as exc:
+        return ("ValueError", str(exc))
+
+
+# ===== Differential tests =====
+def test_compiled_matches_compute_total_fuzz():
+    """Test compiled kernel agrees with compute_total on random invoices"""
+    service = InvoiceService()
+    kernel = compile_pricing(service)
+    rng = random.Random(2024)
+    for _ in range(5000):
+        inv = _random_invoice(rng)
+        assert _outcome(kernel, inv) == _outcome(service.compute_total, inv)
+
+
+def test_compiled_missing_invoice():
+    """Test compiled kernel rejects a missing invoice like compute_total"""
+    kernel = compile_pricing(InvoiceService())
+    with pytest.raises(ValueError, match="Invoice is missing"):
+        kernel(None)
+
+
+# ===== Cache tests =====
+def test_compile_is_cached_per_rule_snapshot():
+    """Test identical rules reuse the same compiled function"""
+    assert compile_pricing(InvoiceService()) is compile_pricing(InvoiceService())
+
+
+def test_rules_are_inlined():
+    """Test rule values appear as literals in generated source"""
+    source = generate_source(InvoiceService().rules_snapshot())
+    assert "0.07" in source
+    assert "TAX_RATES" not in source
+
+
+def test_pricer_refresh_after_rule_change():
+    """Test CompiledPricer regenerates when the service rules change"""
+    service = InvoiceService()
+    pricer = CompiledPricer(service)
+    inv = Invoice(
+        invoice_id="I-001",
+        customer_id="C-001",
+        country="TH",
+        membership="none",
+        coupon=None,
+        items=[LineItem(sku="A", category="book", unit_price=100.0, qty=10)]
+    )
+    assert pricer.refresh() is False
+
+    service.update_rules(TAX_RATES={**service.rules.TAX_RATES, "TH": 0.15})
+    assert pricer.refresh() is True
+    assert pricer(inv) == service.compute_total(inv)
+
+
+def test_compile_rules_without_coupons():
+    """Test a rule set without coupons still warns on any coupon"""
+    rules = InvoiceService().rules_snapshot()._replace(coupon_rates=())
+    kernel = compile_rules(rules)
+    inv = Invoice(
+        invoice_id="I-001",
+        customer_id="C-001",
+        country="US",
+        membership="none",
+        coupon="WELCOME10",
+        items=[LineItem(sku="A", category="book", unit_price=10.0, qty=1)]
+    )
+    _, warnings = kernel(inv)
+    assert warnings == ["Unknown coupon"]
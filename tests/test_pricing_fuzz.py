@@ -0,0 +1,102 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
+import sys
+sys.path.insert(0, '/workspaces/static_analysis_lab/src')
+
+from fx_rates import FxRateTable
+from invoice_service import InvoiceService, Invoice, LineItem
+from pricing_compiler import compile_pricing, compile_rules
+from pricing_fuzz import (
+    InvoiceGenerator, Outcome, default_engines, fuzz, run_engine, same_outcome, shrink,
+)
+
+
+def _broken_th_shipping(service):
+    """Compiled kernel whose TH free-shipping cutoff is off by one cent"""
+    rules = service.rules_snapshot()
+    shipping = tuple(
+        (country, ((500.01, 0), (float("inf"), 60)) if country == "TH" else tiers)
+        for country, tiers in rules.shipping_rates
+    )
+    return compile_rules(rules._replace(shipping_rates=shipping))
+
+
+# ===== Harness tests =====
+def test_default_engines_agree_with_reference():
+    """Test every shipped engine matches compute_total on generated invoices"""
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        reference, candidates, generator = default_engines(executor)
+        assert fuzz(reference, candidates, generator, cases=20000, seed=1) == []
+
+
+def test_generator_hits_thresholds_and_defects():
+    """Test generated invoices land exactly on rule thresholds and include invalid ones"""
+    service = InvoiceService()
+    generator = InvoiceGenerator(service)
+    rng = random.Random(5)
+    invoices = [generator.invoice(rng) for _ in range(5000)]
+    subtotals = {sum(it.unit_price * it.qty for it in inv.items) for inv in invoices if inv is not None}
+    for threshold in (100, 200, 300, 500, 3000, 4000, 10000):
+        assert threshold in subtotals
+    errors = [run_engine(service.compute_total, inv).error for inv in invoices]
+    assert any(error and "Invalid qty" in error for error in errors)
+    assert any(error == "ValueError: Invoice is missing" for error in errors)
+
+
+def test_boundary_bug_is_found_and_shrunk():
+    """Test an off-by-one threshold is caught and reduced to a minimal invoice"""
+    service = InvoiceService()
+    mismatches = fuzz(
+        service.compute_total,
+        {"broken": _broken_th_shipping(service)},
+        InvoiceGenerator(service),
+        cases=5000,
+        max_failures=1,
+    )
+    assert len(mismatches) == 1
+    small = mismatches[0].invoice
+    assert small.country == "TH"
+    assert small.coupon is None
+    assert small.membership == "none"
+    assert len(small.items) == 1
+    assert small.items[0].qty == 1
+    assert 500 <= small.items[0].unit_price < 500.01
+
+
+def test_candidate_with_its_own_reference():
+    """Test a (reference, engine) pair is checked against its own reference"""
+    plain = InvoiceService()
+    with_fx = InvoiceService(fx=FxRateTable("THB", {"USD": 0.028}))
+    generator = InvoiceGenerator(with_fx)
+    kernel = compile_pricing(plain)
+    assert fuzz(with_fx.compute_total, {"plain": (plain.compute_total, kernel)}, generator, cases=2000) == []
+    mismatches = fuzz(with_fx.compute_total, {"plain": kernel}, generator, cases=2000, max_failures=1)
+    assert "Unknown currency" in mismatches[0].actual.error
+
+
+# ===== Comparison tests =====
+def test_same_outcome_tolerance():
+    """Test totals compare within tolerance while warnings and errors compare exactly"""
+    assert same_outcome(Outcome(total=100.0), Outcome(total=100.0 + 1e-12))
+    assert not same_outcome(Outcome(total=100.0), Outcome(total=100.01))
+    assert not same_outcome(Outcome(total=1.0, warnings=("Unknown coupon",)), Outcome(total=1.0))
+    assert not same_outcome(Outcome(error="ValueError: a"), Outcome(error="ValueError: b"))
+    assert not same_outcome(Outcome(error="ValueError: a"), Outcome(total=1.0))
+
+
+def test_shrink_keeps_failure():
+    """Test shrinking only accepts simplifications that still fail"""
+    inv = Invoice(
+        invoice_id="I-9",
+        customer_id="C-9",
+        country="US",
+        membership="gold",
+        coupon=" VIP20 ",
+        items=[
+            LineItem(sku="X", category="food", unit_price=12.345, qty=3, fragile=True),
+            LineItem(sku="Y", category="toys", unit_price=7.0, qty=2),
+        ],
+    )
+    small = shrink(inv, lambda c: c is not None and any(it.category == "toys" for it in c.items))
+    assert small.items == [LineItem(sku="A", category="toys", unit_price=0.0, qty=1)]
+    assert small.coupon is None
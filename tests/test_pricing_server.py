@@ -0,0 +1,173 @@
+import asyncio
+import pytest
+import sys
+sys.path.insert(0, '/workspaces/static_analysis_lab/src')
+
+from invoice_codec import decode_invoice, encode_invoice
+from invoice_service import InvoiceService
+from pricing_client import PricingClient
+from pricing_server import PricingServer
+
+
+def _run(scenario, **server_options):
+    """Start a server on an ephemeral port, run ``scenario(server, client)``."""
+    async def main():
+        server = PricingServer(port=0, **server_options)
+        await server.start()
+        try:
+            async with PricingClient(port=server.port) as client:
+                return await scenario(server, client)
+        finally:
+            await server.close()
+    return asyncio.run(main())
+
+
+# ===== Payload tests =====
+def test_encode_decode_round_trip(make_invoice):
+    """Test compact JSON invoices round-trip"""
+    inv = make_invoice(qty=2, coupon="BOGUS", fragile=True, currency="USD")
+    assert decode_invoice(encode_invoice(inv)) == inv
+
+
+def test_decode_malformed_invoice(make_invoice):
+    """Test missing and wrongly typed fields are rejected"""
+    with pytest.raises(ValueError, match="missing customer_id, country, items"):
+        decode_invoice({"invoice_id": "I-001"})
+    with pytest.raises(ValueError, match="bad qty"):
+        decode_invoice({**encode_invoice(make_invoice()), "items": [["A", "book", 1.0, 1.5]]})
+
+
+# ===== Endpoint tests =====
+def test_price_endpoint_matches_service(make_invoice):
+    """Test single pricing agrees with InvoiceService over several keep-alive requests"""
+    async def scenario(server, client):
+        return [await client.price(make_invoice(qty=qty, coupon="BOGUS")) for qty in (1, 2, 3)]
+
+    expected = InvoiceService()
+    for qty, (status, body) in zip((1, 2, 3), _run(scenario)):
+        total, warnings = expected.compute_total(make_invoice(qty=qty, coupon="BOGUS"))
+        assert status == 200
+        assert body == {"total": total, "warnings": warnings}
+
+
+def test_price_endpoint_validation_error(make_invoice):
+    """Test invalid invoices return 422 with the validation message"""
+    async def scenario(server, client):
+        return await client.price(make_invoice(qty=0))
+
+    status, body = _run(scenario)
+    assert status == 422
+    assert body == {"error": "Invalid qty for A"}
+
+
+def test_batch_endpoint(make_invoice):
+    """Test batch pricing returns one result per invoice"""
+    async def scenario(server, client):
+        return await client.price_batch([make_invoice(qty=1), make_invoice(qty=0)])
+
+    status, body = _run(scenario)
+    assert status == 200
+    assert body["results"][0]["total"] > 0
+    assert body["results"][1] == {"error": "Invalid qty for A"}
+
+
+def test_bad_requests():
+    """Test malformed JSON, unknown paths and wrong methods"""
+    async def scenario(server, client):
+        return [
+            await client.request("POST", "/price/batch", {"nope": []}),
+            await client.request("GET", "/price"),
+            await client.request("POST", "/missing", {}),
+            await client.request("GET", "/health"),
+        ]
+
+    (batch, wrong_method, missing, health) = _run(scenario)
+    assert batch[0] == 400
+    assert wrong_method[0] == 405
+    assert missing[0] == 404
+    assert health == (200, {"status": "ok", "queued": 0})
+
+
+def test_full_queue_returns_503(make_invoice):
+    """Test requests beyond the queue bound are rejected"""
+    async def scenario(server, client):
+        server._worker.cancel()
+        server._queue.put_nowait(("/price", {}, asyncio.get_running_loop().create_future()))
+        return await client.price(make_invoice())
+
+    status, body = _run(scenario, queue_size=1)
+    assert status == 503
+    assert body == {"error": "Server busy"}
+
+
+def test_bad_payload_types_do_not_stop_the_worker(make_invoice):
+    """Test wrongly typed fields get 422 and later requests are still served"""
+    async def scenario(server, client):
+        good = encode_invoice(make_invoice())
+        bad_price = {**good, "items": [["A", "book", "x", 1, False]]}
+        bad_country = {**good, "country": []}
+        return [
+            await client.request("POST", "/price", bad_price),
+            await client.request("POST", "/price", bad_country),
+            await client.request("POST", "/price/batch", {"invoices": [bad_price, good]}),
+            await client.price(make_invoice()),
+        ]
+
+    bad_price, bad_country, batch, good = _run(scenario)
+    assert bad_price == (422, {"error": "Malformed invoice: bad unit_price"})
+    assert bad_country == (422, {"error": "Malformed invoice: bad country"})
+    assert batch[1]["results"][0] == {"error": "Malformed invoice: bad unit_price"}
+    assert "total" in batch[1]["results"][1]
+    assert good[0] == 200
+
+
+def test_unexpected_error_returns_500_and_worker_survives(make_invoice):
+    """Test a failing kernel answers 500 without killing the worker"""
+    async def scenario(server, client):
+        kernel = server.pricer._kernel
+        server.pricer._kernel = lambda inv: 1 / 0
+        failed = await client.price(make_invoice())
+        server.pricer._kernel = kernel
+        return failed, await client.price(make_invoice())
+
+    failed, good = _run(scenario)
+    assert failed == (500, {"error": "Internal error: ZeroDivisionError"})
+    assert good[0] == 200
+
+
+def test_rule_updates_reach_the_server(make_invoice):
+    """Test rules updated on server.service are used by later requests"""
+    async def scenario(server, client):
+        before = await client.price(make_invoice())
+        server.service.update_rules(TAX_RATES={**server.service.rules.TAX_RATES, "TH": 0.5})
+        return before, await client.price(make_invoice())
+
+    before, after = _run(scenario)
+    service = InvoiceService()
+    assert before[1]["total"] == service.compute_total(make_invoice())[0]
+    service.update_rules(TAX_RATES={**service.rules.TAX_RATES, "TH": 0.5})
+    assert after[1]["total"] == service.compute_total(make_invoice())[0]
+    assert after[1]["total"] != before[1]["total"]
+
+
+def test_malformed_framing_is_rejected():
+    """Test negative Content-Length and oversized headers are answered, not crashed on"""
+    async def send(server, raw):
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        writer.write(raw)
+        await writer.drain()
+        status_line = await reader.readline()
+        writer.close()
+        return int(status_line.split()[1])
+
+    async def scenario(server, client):
+        return [
+            await send(server, b"POST /price HTTP/1.1\r\nContent-Length: -1\r\n\r\n"),
+            await send(server, b"GET /health HTTP/1.1\r\nX-Big: " + b"a" * 70000 + b"\r\n\r\n"),
+            await client.request("GET", "/health"),
+        ]
+
+    negative, big_header, health = _run(scenario)
+    assert negative == 400
+    assert big_header == 431
+    assert health[0] == 200
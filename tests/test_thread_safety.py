@@ -0,0 +1,246 @@
+import random
+import threading
+import pytest
+import sys
+sys.path.insert(0, '/workspaces/static_analysis_lab/src')
+
+from customer_accounts import CustomerAccounts, SECONDS_PER_DAY
+from fx_rates import FxRateTable
+from invoice_service import InvoiceService, Invoice, LineItem
+from latency_profiler import ProfiledPricer
+from pricing_compiler import compile_pricing
+
+THREADS = 8
+
+
+def _invoices(count, seed=11):
+    rng = random.Random(seed)
+    return [
+        Invoice(
+            invoice_id=f"I-{i}",
+            customer_id=f"C-{i % 5}",
+            country=rng.choice(["TH", "JP", "US", "XX"]),
+            membership=rng.choice(["none", "gold"]),
+            coupon=rng.choice([None, "VIP20", "BOGUS"]),
+            items=[LineItem(sku="A", category="book", unit_price=rng.uniform(1, 6000), qty=rng.randint(1, 3),
+                            fragile=rng.random() < 0.5)],
+            currency=rng.choice([None, "USD", "JPY"]),
+        )
+        for i in range(count)
+    ]
+
+
+def _service():
+    accounts = CustomerAccounts(clock=lambda: 1000 * SECONDS_PER_DAY)
+    for i in range(5):
+        accounts.record(f"C-{i}", 2000.0 * i)
+    return InvoiceService(accounts=accounts, fx=FxRateTable("THB", {"USD": 0.025, "JPY": 4.0}))
+
+
+def _outcome(price, inv):
+    try:
+        return price(inv)
+    except ValueError as exc:
+        return str(exc)
+
+
+def _hammer(target, threads=THREADS):
+    errors = []
+    barrier = threading.Barrier(threads)
+
+    def run(index):
+        barrier.wait()
+        try:
+            target(index)
+        except Exception as exc:
+            errors.append(exc)
+
+    workers = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert not errors, errors
+
+
+# ===== Stress tests =====
+def test_shared_instance_is_deterministic():
+    """Test many threads pricing through one instance get the single-threaded results"""
+    invoices = _invoices(500)
+    service = _service()
+    expected = [service.compute_total(inv) for inv in invoices]
+
+    def price(index):
+        for _ in range(4):
+            assert [service.compute_total(inv) for inv in invoices] == expected
+
+    _hammer(price)
+
+
+def test_rule_updates_are_atomic():
+    """Test concurrent rule swaps never produce results mixing two rule sets"""
+    invoices = _invoices(200)
+    service = _service()
+    old_rules = service.rules
+    high_tax = {country: 0.5 for country in old_rules.TAX_RATES}
+    before = [service.compute_total(inv) for inv in invoices]
+    service.update_rules(TAX_RATES=high_tax, DEFAULT_TAX_RATE=0.5)
+    after = [service.compute_total(inv) for inv in invoices]
+    stop = threading.Event()
+
+    def flip():
+        while not stop.is_set():
+            service.update_rules(TAX_RATES=old_rules.TAX_RATES, DEFAULT_TAX_RATE=old_rules.DEFAULT_TAX_RATE)
+            service.update_rules(TAX_RATES=high_tax, DEFAULT_TAX_RATE=0.5)
+
+    flipper = threading.Thread(target=flip)
+    flipper.start()
+    try:
+        def price(index):
+            for _ in range(5):
+                for inv, a, b in zip(invoices, before, after):
+                    assert service.compute_total(inv) in (a, b)
+
+        _hammer(price)
+    finally:
+        stop.set()
+        flipper.join()
+
+
+def test_shared_compiled_kernel_is_deterministic():
+    """Test many threads pricing through one compiled kernel get compute_total's results"""
+    invoices = _invoices(500)
+    service = _service()
+    kernel = compile_pricing(service)
+    expected = [service.compute_total(inv) for inv in invoices]
+
+    def price(index):
+        for _ in range(4):
+            assert [kernel(inv) for inv in invoices] == expected
+
+    _hammer(price)
+
+
+def test_compiled_kernel_follows_fx_swaps():
+    """Test concurrent FX table swaps never leave a compiled kernel on stale rates or currencies"""
+    invoices = _invoices(200)
+    service = _service()
+    kernel = compile_pricing(service)
+    # The second table drops JPY, so JPY invoices must start failing
+    tables = [service.fx, FxRateTable("THB", {"USD": 0.03, "EUR": 0.026})]
+    expected = []
+    for table in tables:
+        service.fx = table
+        expected.append([_outcome(service.compute_total, inv) for inv in invoices])
+    assert any(isinstance(outcome, str) for outcome in expected[1])
+    stop = threading.Event()
+
+    def flip():
+        while not stop.is_set():
+            for table in tables:
+                service.fx = table
+
+    flipper = threading.Thread(target=flip)
+    flipper.start()
+    try:
+        def price(index):
+            for _ in range(5):
+                for i, inv in enumerate(invoices):
+                    assert _outcome(kernel, inv) in (expected[0][i], expected[1][i])
+
+        _hammer(price)
+    finally:
+        stop.set()
+        flipper.join()
+    for table, outcomes in zip(tables, expected):
+        service.fx = table
+        assert [_outcome(kernel, inv) for inv in invoices] == outcomes
+
+
+def test_threaded_batch_matches_sequential():
+    """Test the thread-pool batch API returns results in input order"""
+    invoices = _invoices(1000)
+    service = _service()
+    expected = service.compute_totals(invoices, report_currency="THB")
+    assert service.compute_totals_threaded(invoices, report_currency="THB", chunk_size=64) == expected
+
+
+def test_concurrent_report_currency_batches():
+    """Test concurrent report-currency batches on one instance do not interfere"""
+    invoices = _invoices(300)
+    service = _service()
+    expected = service.compute_totals(invoices, report_currency="USD")
+
+    def price(index):
+        for _ in range(5):
+            assert service.compute_totals(invoices, report_currency="USD") == expected
+
+    _hammer(price)
+
+
+def test_concurrent_account_updates():
+    """Test concurrent recording into shared accounts loses no spend"""
+    accounts = CustomerAccounts()
+
+    def record(index):
+        for _ in range(1000):
+            accounts.record("C-001", 1.0, day=1000 + index % 3)
+
+    _hammer(record)
+    assert accounts.rolling_spend("C-001", day=1002) == THREADS * 1000
+
+
+def test_concurrent_account_creation_and_lookups():
+    """Test threads creating and reading many accounts at once see consistent spend"""
+    accounts = CustomerAccounts(clock=lambda: 1000 * SECONDS_PER_DAY)
+
+    def work(index):
+        for i in range(600):
+            accounts.record(f"C-{index}-{i}", 1.0, day=1000)
+            accounts.record(f"C-{index}-{i}", 2.0, day=990)
+            assert accounts.rolling_spend(f"C-{index}-{i}") == 3.0
+            assert accounts.rolling_spend(f"C-{(index + 1) % THREADS}-{i}") in (0.0, 1.0, 3.0)
+
+    _hammer(work)
+    assert len(accounts) == THREADS * 600
+    assert all(accounts.rolling_spend(f"C-{t}-{i}", window=30) == 3.0 for t in range(THREADS) for i in range(600))
+
+
+def test_shared_profiler_counts_every_timed_call():
+    """Test one ProfiledPricer shared by many threads records every call and survives cProfile"""
+    invoices = _invoices(300)
+    service = _service()
+    timed = ProfiledPricer(service.compute_total, slow_threshold_ms=0, capacity=50)
+    profiled = ProfiledPricer(service.compute_total, cprofile_fraction=0.3, seed=1)
+
+    def price(index):
+        for inv in invoices:
+            _outcome(timed, inv)
+            _outcome(profiled, inv)
+
+    _hammer(price)
+    assert timed.histogram.count == sum(timed.histogram.counts) == THREADS * len(invoices)
+    assert len(timed.slow) == 50
+    assert profiled.stats is not None
+    assert 0 < profiled.histogram.count < THREADS * len(invoices)
+
+
+# ===== Rule state tests =====
+def test_rules_are_read_only():
+    """Test rule state cannot be mutated in place"""
+    service = InvoiceService()
+    with pytest.raises(TypeError):
+        service.rules.TAX_RATES["TH"] = 0.5
+
+
+def test_update_rules_rejects_unknown_names():
+    """Test update_rules only accepts known rule tables"""
+    with pytest.raises(ValueError, match="Unknown rules: TAX"):
+        InvoiceService().update_rules(TAX={})
+
+
+def test_instances_do_not_share_rule_updates():
+    """Test updating one instance leaves others and the class defaults alone"""
+    first, second = InvoiceService(), InvoiceService()
+    first.update_rules(DEFAULT_TAX_RATE=0.5)
+    assert second.rules.DEFAULT_TAX_RATE == InvoiceService.DEFAULT_TAX_RATE == 0.05